@@ -0,0 +1,60 @@
+"""
+Shared fixtures for the Factory Acceptance Tests
+"""
+
+import pytest
+
+
+class FakeMqttResult:
+    """Minimal stand-in for paho's MQTTMessageInfo"""
+    rc = 0
+    mid = 0
+
+    def wait_for_publish(self, timeout=None):
+        return None
+
+    def is_published(self):
+        return True
+
+
+class FakeMqttClient:
+    """Null-transport MQTT client implementing the calls the services make"""
+
+    def __init__(self, *args, **kwargs):
+        self.on_connect = None
+        self.on_disconnect = None
+        self.on_message = None
+        self.published = []
+
+    def connect(self, *args, **kwargs):
+        return 0
+
+    def disconnect(self, *args, **kwargs):
+        return 0
+
+    def loop(self, *args, **kwargs):
+        return 0
+
+    def loop_start(self):
+        return 0
+
+    def loop_stop(self, *args, **kwargs):
+        return 0
+
+    def subscribe(self, *args, **kwargs):
+        return (0, 0)
+
+    def publish(self, topic, payload=None, *args, **kwargs):
+        self.published.append((topic, payload))
+        return FakeMqttResult()
+
+    def is_connected(self):
+        return True
+
+
+@pytest.fixture(scope="session", autouse=True)
+def mqtt_patch():
+    """Swap the paho MQTT client for FakeMqttClient for the whole session"""
+    with pytest.MonkeyPatch.context() as monkeypatch:
+        monkeypatch.setattr("paho.mqtt.client.Client", FakeMqttClient)
+        yield FakeMqttClient
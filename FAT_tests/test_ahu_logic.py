@@ -11,15 +11,20 @@ pytest test_ahu_logic.py -v
 
 import sys
 import os
+import importlib.util
 import pytest
 import time
 import json
+import msgpack
+import numpy as np
 from unittest.mock import Mock, patch
 
 # Add parent directory to path to import simulator modules
 sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
 
-from simulator.ahu_simulator import AHUSimulator, AHUState, PIDController
+from simulator.ahu_simulator import (
+    AHUFleetSimulator, AHUSimulator, AHUState, PIDController, ALARM_NAMES,
+    ALARM_PROBABILITY, WEATHER_RETRY_S)
 
 
 class TestPIDController:
@@ -31,6 +36,7 @@ class TestPIDController:
         assert pid.kp == 1.0
         assert pid.ki == 0.1
         assert pid.kd == 0.05
+        assert pid.integral_limit == 50.0
         assert pid.prev_error == 0.0
         assert pid.integral == 0.0
 
@@ -50,8 +56,8 @@ class TestPIDController:
         dt1 = 1.0
         output1 = pid.update(error1, dt1)
 
-        # Output should be kp * error + ki * error * dt + kd * (error - prev_error) / dt
-        # For first call, prev_error = 0.0
+        # Output should be kp * error + ki * integral + kd * (error - prev_error) / dt
+        # For first call, integral = error * dt and prev_error = 0.0
         expected_output1 = 1.0 * 2.0 + 0.1 * \
             2.0 * 1.0 + 0.05 * (2.0 - 0.0) / 1.0
         assert abs(output1 - expected_output1) < 0.001        # Second update
@@ -62,6 +68,21 @@ class TestPIDController:
         # Should include derivative term
         assert output2 != output1
 
+    def test_pid_controller_anti_windup(self):
+        """Test PID integral term is clamped under a sustained error"""
+        pid = PIDController(kp=1.0, ki=0.1, kd=0.0, integral_limit=10.0)
+
+        for _ in range(100):
+            output = pid.update(5.0, 1.0)
+
+        assert pid.integral == 10.0
+        assert abs(output - (1.0 * 5.0 + 0.1 * 10.0)) < 0.001
+
+        for _ in range(100):
+            pid.update(-5.0, 1.0)
+
+        assert pid.integral == -10.0
+
 
 class TestAHUState:
     """Test AHU state data structure"""
@@ -77,27 +98,42 @@ class TestAHUState:
         assert state.alarm is None
 
 
+@pytest.fixture(scope="session")
+def simulator_config():
+    """Fixture providing test configuration (shared, treat as read-only)"""
+    return {
+        'mqtt_broker': 'localhost',
+        'mqtt_port': 1883,
+        'mqtt_topic': 'test/ahu1/telemetry',
+        'device_id': 'test_ahu1',
+        'building_id': 'test_building',
+        'pid_kp': 2.0,
+        'pid_ki': 0.1,
+        'pid_kd': 0.05
+    }
+
+
+@pytest.fixture(scope="session")
+def shared_simulator(mqtt_patch, simulator_config):
+    """Simulator instance shared by tests that do not mutate its state"""
+    return AHUSimulator(simulator_config)
+
+
+@pytest.fixture
+def simulator(request, simulator_config):
+    """Fresh simulator with state overrides supplied via indirect parametrization"""
+    simulator = AHUSimulator(simulator_config)
+    for name, value in getattr(request, 'param', {}).items():
+        setattr(simulator.state, name, value)
+    return simulator
+
+
 class TestAHUSimulator:
     """Test AHU simulator control logic"""
 
-    @pytest.fixture
-    def simulator_config(self):
-        """Fixture providing test configuration"""
-        return {
-            'mqtt_broker': 'localhost',
-            'mqtt_port': 1883,
-            'mqtt_topic': 'test/ahu1/telemetry',
-            'device_id': 'test_ahu1',
-            'building_id': 'test_building',
-            'pid_kp': 2.0,
-            'pid_ki': 0.1,
-            'pid_kd': 0.05
-        }
-
-    @patch('paho.mqtt.client.Client')
-    def test_simulator_initialization(self, mock_mqtt, simulator_config):
+    def test_simulator_initialization(self, shared_simulator, simulator_config):
         """Test simulator initialization"""
-        simulator = AHUSimulator(simulator_config)
+        simulator = shared_simulator
 
         assert simulator.config == simulator_config
         assert isinstance(simulator.state, AHUState)
@@ -106,106 +142,73 @@ class TestAHUSimulator:
         assert simulator.pid.ki == 0.1
         assert simulator.pid.kd == 0.05
 
-    @patch('paho.mqtt.client.Client')
-    def test_economizer_logic_cold_outside(self, mock_mqtt, simulator_config):
-        """Test economizer opens when outside temperature is favorable"""
-        simulator = AHUSimulator(simulator_config)
-
-        # Set cold outside temperature (good for free cooling)
-        simulator.state.outside_temp = 15.0  # Below setpoint + 2
-        simulator.state.setpoint = 18.0
-
-        # Update control logic
-        simulator.update_control_logic(1.0)
-
-        # Economizer should open
-        assert simulator.state.economizer_position > 0
-        print(
-            f"Economizer position with cold outside air: {simulator.state.economizer_position}%")
-
-    @patch('paho.mqtt.client.Client')
-    def test_economizer_logic_warm_outside(self, mock_mqtt, simulator_config):
-        """Test economizer closes when outside temperature is not favorable"""
-        simulator = AHUSimulator(simulator_config)
-
-        # Set warm outside temperature (not good for free cooling)
-        simulator.state.outside_temp = 25.0  # Above setpoint + 2
-        simulator.state.setpoint = 18.0
-
+    @pytest.mark.parametrize("simulator,expected_open", [
+        pytest.param({'outside_temp': 15.0, 'setpoint': 18.0}, True,
+                     id="free-cooling"),     # Below setpoint + 2
+        pytest.param({'outside_temp': 25.0, 'setpoint': 18.0}, False,
+                     id="no-free-cooling"),  # Above setpoint + 2
+    ], indirect=["simulator"])
+    def test_economizer(self, simulator, expected_open):
+        """Test economizer opens only when outside temperature is favorable"""
         # Update control logic
         simulator.update_control_logic(1.0)
 
-        # Economizer should be closed
-        assert simulator.state.economizer_position == 0.0
-        print(
-            f"Economizer position with warm outside air: {simulator.state.economizer_position}%")
-
-    @patch('paho.mqtt.client.Client')
-    def test_vfd_speed_control(self, mock_mqtt, simulator_config):
-        """Test VFD speed responds to temperature error"""
-        simulator = AHUSimulator(simulator_config)
-
-        # Set supply temperature higher than setpoint (needs more cooling)
-        simulator.state.supply_temp = 20.0
-        simulator.state.setpoint = 18.0
-
+        if expected_open:
+            assert simulator.state.economizer_position > 0
+        else:
+            assert simulator.state.economizer_position == 0.0
+
+    @pytest.mark.parametrize("simulator,iterations,expected_increase", [
+        pytest.param({'supply_temp': 20.0, 'setpoint': 18.0}, 5, True,
+                     id="needs-cooling"),
+        pytest.param({'supply_temp': 30.0, 'setpoint': 18.0}, 20, False,
+                     id="extreme-error-limits"),
+    ], indirect=["simulator"])
+    def test_vfd_speed(self, simulator, iterations, expected_increase):
+        """Test VFD speed responds to temperature error and stays within limits"""
         initial_vfd_speed = simulator.state.vfd_speed
 
         # Update control logic multiple times to see PID response
-        for _ in range(5):
-            simulator.update_control_logic(1.0)
-
-        # VFD speed should increase to provide more cooling
-        assert simulator.state.vfd_speed > initial_vfd_speed
-        print(
-            f"VFD speed increased from {initial_vfd_speed}% to {simulator.state.vfd_speed}%")
-
-    @patch('paho.mqtt.client.Client')
-    def test_vfd_speed_limits(self, mock_mqtt, simulator_config):
-        """Test VFD speed stays within limits"""
-        simulator = AHUSimulator(simulator_config)
-
-        # Extreme temperature error to test limits
-        simulator.state.supply_temp = 30.0  # Very high
-        simulator.state.setpoint = 18.0
-
-        # Update control logic many times
-        for _ in range(20):
+        for _ in range(iterations):
             simulator.update_control_logic(1.0)
 
-        # VFD speed should be within 0-100% range (updated for new control logic)
+        # VFD speed should be within 0-100% range
         assert 0.0 <= simulator.state.vfd_speed <= 100.0
-        print(f"VFD speed within limits: {simulator.state.vfd_speed}%")
-
-    @patch('paho.mqtt.client.Client')
-    def test_fan_status_logic(self, mock_mqtt, simulator_config):
+        if expected_increase:
+            # VFD speed should increase to provide more cooling
+            assert simulator.state.vfd_speed > initial_vfd_speed
+
+    @pytest.mark.parametrize("simulator,expected_status", [
+        pytest.param({'vfd_speed': 60.0}, "ON", id="above-threshold"),
+        pytest.param({'vfd_speed': 5.0}, "OFF", id="below-threshold"),
+    ], indirect=["simulator"])
+    def test_fan_status_logic(self, simulator, expected_status):
         """Test fan status changes with VFD speed"""
-        simulator = AHUSimulator(simulator_config)
-
-        # Test fan ON when VFD speed is above threshold
-        simulator.state.vfd_speed = 60.0
         # Just update the fan status logic part without running full control logic
         if simulator.state.vfd_speed > 10.0:
             simulator.state.fan_status = "ON"
         else:
             simulator.state.fan_status = "OFF"
-        assert simulator.state.fan_status == "ON"
+        assert simulator.state.fan_status == expected_status
 
-        # Test fan OFF when VFD speed is below threshold
-        simulator.state.vfd_speed = 5.0
-        # Just update the fan status logic part without running full control logic
-        if simulator.state.vfd_speed > 10.0:
-            simulator.state.fan_status = "ON"
-        else:
-            simulator.state.fan_status = "OFF"
-        assert simulator.state.fan_status == "OFF"
+    def test_alarm_countdown(self, simulator_config):
+        """Test alarms are raised and cleared when their countdowns run out"""
+        simulator = AHUSimulator(simulator_config)
+        simulator._alarm_in, simulator._clear_in = 1, 10**9
+        simulator.update_control_logic(1.0)
+        assert simulator.state.alarm in ALARM_NAMES
+        assert simulator._alarm_in >= 1
 
-        print(f"Fan status correctly follows VFD speed")
+        simulator._alarm_in, simulator._clear_in = 10**9, 2
+        simulator.update_control_logic(1.0)
+        assert simulator.state.alarm is not None
+        simulator.update_control_logic(1.0)
+        assert simulator.state.alarm is None
+        assert simulator._clear_in >= 1
 
-    @patch('paho.mqtt.client.Client')
-    def test_telemetry_payload_format(self, mock_mqtt, simulator_config):
+    def test_telemetry_payload_format(self, shared_simulator):
         """Test telemetry payload format matches specification"""
-        simulator = AHUSimulator(simulator_config)
+        simulator = shared_simulator
 
         payload = simulator.create_telemetry_payload()
 
@@ -237,11 +240,101 @@ class TestAHUSimulator:
         assert isinstance(points['vfd_speed'], (int, float))
         assert isinstance(points['fan_status'], str)
 
-        print("Telemetry payload format validation passed")
+    @pytest.mark.parametrize("payload_format,decode", [
+        ('json', json.loads),
+        ('msgpack', lambda raw: msgpack.unpackb(raw, raw=False)),
+    ])
+    def test_telemetry_payload_encoding(self, simulator_config, payload_format, decode):
+        """Test telemetry payload round-trips through each supported codec"""
+        simulator = AHUSimulator(
+            dict(simulator_config, payload_format=payload_format))
+
+        payload = simulator.create_telemetry_payload()
+        encoded = simulator.encode_telemetry_payload(payload)
+
+        assert decode(encoded) == payload
+
+    def test_telemetry_json_fast_path(self, simulator_config):
+        """Test the pre-serialized JSON encoding matches the payload dict"""
+        simulator = AHUSimulator(simulator_config)
+        simulator.state.supply_temp = 18.25
+        simulator.state.alarm = "Low Airflow"
+
+        encoded = json.loads(simulator.encode_telemetry_json())
+        payload = simulator.create_telemetry_payload()
+        assert encoded.pop('ts') <= payload.pop('ts')
+        assert encoded == payload
+
+        # A timestamp passed in from the run loop is used as-is by both
+        ts = 1_700_000_000_000
+        assert json.loads(simulator.encode_telemetry_json(ts)) == \
+            simulator.create_telemetry_payload(ts)
+
+    def test_runs_without_orjson(self, monkeypatch, simulator_config):
+        """Test the simulator imports and encodes JSON without orjson (PyPy)"""
+        # A None entry in sys.modules makes `import orjson` raise ImportError
+        monkeypatch.setitem(sys.modules, 'orjson', None)
+        name = 'ahu_simulator_without_orjson'
+        spec = importlib.util.spec_from_file_location(
+            name, os.path.join(os.path.dirname(__file__), '..',
+                               'simulator', 'ahu_simulator.py'))
+        module = importlib.util.module_from_spec(spec)
+        monkeypatch.setitem(sys.modules, name, module)
+        spec.loader.exec_module(module)
+
+        simulator = module.AHUSimulator(simulator_config)
+        simulator.state.alarm = "Low Airflow"
+        ts = 1_700_000_000_000
+        payload = simulator.create_telemetry_payload(ts)
+        assert json.loads(simulator.encode_telemetry_payload(payload)) == payload
+        assert json.loads(simulator.encode_telemetry_json(ts)) == payload
+
+    def test_telemetry_publish_batching(self, simulator_config):
+        """Test batched payloads go out as one list message once the batch fills"""
+        simulator = AHUSimulator(
+            dict(simulator_config, publish_batch_size=3))
+        published = simulator.mqtt_client.published
+
+        simulator.publish_telemetry()
+        simulator.publish_telemetry()
+        assert published == []
+
+        simulator.publish_telemetry()
+        assert len(published) == 1
+        topic, raw = published[0]
+        batch = json.loads(raw)
+        assert topic == simulator_config['mqtt_topic']
+        assert len(batch) == 3
+        assert all(item['device'] == 'test_ahu1' for item in batch)
+
+        # A partial batch is flushed on demand (stop() does this)
+        simulator.publish_telemetry()
+        simulator.flush_telemetry()
+        assert len(published) == 2
+        assert len(json.loads(published[1][1])) == 1
+
+    def test_fleet_publishes_per_device(self, simulator_config):
+        """Test a multi-AHU simulator steps every unit and publishes each one"""
+        simulator = AHUFleetSimulator(dict(simulator_config, n_ahus=3))
+        simulator.state.outside_temp = 15.0
+        simulator.supply[:] = [20.0, 18.0, 16.0]
 
-    @patch('requests.get')
-    @patch('paho.mqtt.client.Client')
-    def test_weather_api_integration(self, mock_mqtt, mock_requests, simulator_config):
+        for _ in range(5):
+            simulator.update_control_logic(1.0)
+        assert ((simulator.vfd >= 0.0) & (simulator.vfd <= 100.0)).all()
+        assert (simulator.econ > 0.0).all()
+
+        simulator.publish_telemetry()
+        published = simulator.mqtt_client.published
+        assert [topic for topic, _ in published] == [
+            f"building/test_building/ahu{i}/telemetry" for i in (1, 2, 3)]
+        payloads = [json.loads(raw) for _, raw in published]
+        assert [p['device'] for p in payloads] == ['ahu1', 'ahu2', 'ahu3']
+        assert payloads[0]['points']['supply_temp'] == round(
+            simulator.supply[0], 1)
+
+    @patch('requests.Session.get')
+    def test_weather_api_integration(self, mock_requests, simulator_config):
         """Test weather API integration in live mode"""
         # Mock successful weather API response
         mock_response = Mock()
@@ -264,11 +357,81 @@ class TestAHUSimulator:
         assert isinstance(temp_sim, (int, float))
         assert temp_sim != 25.5  # Should be different from API value
 
-        print(
-            f"Weather API integration test passed: live={temp}, sim={temp_sim}")
+    @patch('requests.Session.get')
+    def test_weather_reading_cached_within_ttl(self, mock_requests, simulator_config):
+        """Test live readings are reused until the TTL expires"""
+        mock_response = Mock()
+        mock_response.status_code = 200
+        mock_response.json.return_value = {
+            'current_weather': {
+                'temperature': 25.5
+            }
+        }
+        mock_requests.return_value = mock_response
 
-    @patch('paho.mqtt.client.Client')
-    def test_control_loop_stability(self, mock_mqtt, simulator_config):
+        simulator = AHUSimulator(simulator_config)
+
+        assert simulator.get_outside_temp('live') == 25.5
+        assert simulator.get_outside_temp('live') == 25.5
+        assert mock_requests.call_count == 1
+
+        # Age the cached reading past the TTL to force a refresh
+        simulator._weather_cache['ts'] -= simulator._weather_ttl
+        assert simulator.get_outside_temp('live') == 25.5
+        assert mock_requests.call_count == 2
+
+    @patch('requests.Session.get')
+    def test_weather_retried_soon_after_failure(self, mock_requests, simulator_config):
+        """Test a failed refresh after a success is retried at the retry interval"""
+        mock_response = Mock()
+        mock_response.status_code = 200
+        mock_response.json.return_value = {
+            'current_weather': {
+                'temperature': 25.5
+            }
+        }
+        mock_requests.side_effect = [mock_response, ConnectionError("offline")]
+
+        simulator = AHUSimulator(simulator_config)
+        # Stop the refresh loop at its first wait and record the interval
+        simulator._stop_event = Mock()
+        simulator._stop_event.wait.return_value = True
+
+        assert simulator.get_outside_temp('live') == 25.5
+        simulator._weather_loop()
+        simulator._stop_event.wait.assert_called_with(simulator._weather_ttl)
+
+        # Expire the good reading; the refetch fails and falls back to sim
+        simulator._weather_cache['ts'] -= simulator._weather_ttl
+        simulator.get_outside_temp('live')
+        simulator._weather_loop()
+        simulator._stop_event.wait.assert_called_with(WEATHER_RETRY_S)
+
+    @patch('requests.Session.get')
+    def test_weather_reading_shared_between_processes(
+            self, mock_requests, simulator_config, tmp_path):
+        """Test a live reading written to the shared file is reused by others"""
+        mock_response = Mock()
+        mock_response.status_code = 200
+        mock_response.json.return_value = {
+            'current_weather': {
+                'temperature': 25.5
+            }
+        }
+        mock_requests.return_value = mock_response
+        config = dict(simulator_config,
+                      weather_cache_file=str(tmp_path / 'weather.json'))
+
+        assert AHUSimulator(config).get_outside_temp('live') == 25.5
+        assert AHUSimulator(config).get_outside_temp('live') == 25.5
+        assert mock_requests.call_count == 1
+
+        # A different location does not reuse the reading
+        moved = dict(config, latitude=51.5)
+        assert AHUSimulator(moved).get_outside_temp('live') == 25.5
+        assert mock_requests.call_count == 2
+
+    def test_control_loop_stability(self, simulator_config):
         """Test that control loop reaches stability"""
         simulator = AHUSimulator(simulator_config)
 
@@ -278,21 +441,14 @@ class TestAHUSimulator:
         simulator.state.setpoint = 18.0
 
         # Run control loop for many iterations
-        temp_history = []
-        for i in range(100):
-            simulator.update_control_logic(1.0)
-            temp_history.append(simulator.state.supply_temp)
+        temp_history = simulator.update_control_logic_batch(np.ones(100))
 
         # Check that temperature stabilizes near setpoint
-        final_temps = temp_history[-10:]  # Last 10 values
-        avg_final_temp = sum(final_temps) / len(final_temps)
+        avg_final_temp = temp_history[-10:].mean()  # Last 10 values
 
         # Should be close to setpoint (within 1 degree)
         assert abs(avg_final_temp - simulator.state.setpoint) < 1.0
 
-        print(
-            f"Control loop stabilized at {avg_final_temp:.2f}°C (setpoint: {simulator.state.setpoint}°C)")
-
 
 def run_integration_test():
     """Run a comprehensive integration test"""
@@ -346,16 +502,20 @@ def run_integration_test():
         print(f"   Points: {list(payload['points'].keys())}")
 
         print("\\n4. Testing alarm generation:")
-        alarm_count = 0
-        for _ in range(1000):  # Run many cycles to trigger random alarm
-            simulator.update_control_logic(0.1)
-            if simulator.state.alarm:
-                alarm_count += 1
-                print(f"   Generated alarm: {simulator.state.alarm}")
-                break
-
-        if alarm_count == 0:
-            print("   No alarms generated (this is random, so may not occur)")
+        # Pre-draw the fault variates for 1000 cycles and jump to the first hit
+        seed = int(time.time())
+        draws = np.random.default_rng(seed).random(1000)
+        hits = np.flatnonzero(draws < ALARM_PROBABILITY)
+        print(f"   Alarm draws seeded with {seed}")
+
+        if hits.size:
+            trigger = int(hits[0])
+            simulator.update_control_logic_batch(np.full(trigger, 0.1))
+            simulator.update_alarm(draws[trigger], 1.0)
+            print(
+                f"   Generated alarm at cycle {trigger + 1}: {simulator.state.alarm}")
+        else:
+            print("   No alarm draw in 1000 cycles for this seed (this is random, so may not occur)")
 
         print("\\n" + "="*60)
         print("INTEGRATION TEST COMPLETED SUCCESSFULLY")
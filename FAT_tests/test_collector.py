@@ -0,0 +1,92 @@
+#!/usr/bin/env python3
+"""
+Tests for the collector's MQTT payload to InfluxDB line protocol conversion
+
+USAGE EXAMPLE:
+pytest FAT_tests/test_collector.py -v
+"""
+
+import math
+import os
+import sys
+from unittest.mock import Mock
+
+import pytest
+
+# Add parent directory to path to import collector modules
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from collector.ingest import TelemetryCollector
+
+TS = 1_700_000_000_000
+
+
+@pytest.fixture
+def collector(monkeypatch):
+    """Collector with a recording write API instead of an InfluxDB client"""
+    monkeypatch.setattr(TelemetryCollector, '_setup_influxdb', lambda self: None)
+
+    def build(measurement='telemetry'):
+        instance = TelemetryCollector(
+            {'influxdb': {'measurement': measurement, 'bucket': 'test_bucket'}})
+        instance.write_api = Mock()
+        return instance
+    return build
+
+
+def written_lines(collector, topic, points, ts=TS):
+    """Lines sent to the write API for one payload"""
+    collector._write_to_influxdb(topic, {'ts': ts, 'points': points})
+    if not collector.write_api.write.called:
+        return []
+    return collector.write_api.write.call_args.kwargs['record']
+
+
+def test_field_types_and_timestamp(collector):
+    """Test each value type gets its own field and the ms timestamp suffix"""
+    lines = written_lines(collector(), 'building/demo/ahu1/telemetry', {
+        'fan_on': True,
+        'alarm_active': False,
+        'stages': 3,
+        'supply_temp': 18.25,
+        'fan_status': 'ON',
+    })
+    series = 'telemetry,building=demo,device=ahu1'
+    assert lines == [
+        f'{series},point=fan_on bool_value=true {TS}',
+        f'{series},point=alarm_active bool_value=false {TS}',
+        f'{series},point=stages value=3.0 {TS}',
+        f'{series},point=supply_temp value=18.25 {TS}',
+        f'{series},point=fan_status text_value="ON" {TS}',
+    ]
+
+
+def test_non_finite_and_missing_values_skipped(collector):
+    """Test NaN, infinities and None produce no line"""
+    instance = collector()
+    lines = written_lines(instance, 'building/demo/ahu1/telemetry', {
+        'a': math.nan, 'b': math.inf, 'c': -math.inf, 'd': None, 'e': 1.5,
+    })
+    assert lines == [f'telemetry,building=demo,device=ahu1,point=e value=1.5 {TS}']
+
+    instance.write_api.reset_mock()
+    assert written_lines(instance, 'building/demo/ahu1/telemetry',
+                         {'a': math.nan}) == []
+
+
+def test_escaping_matches_client_point(collector):
+    """Test measurement, tag and string escaping follow the InfluxDB client"""
+    lines = written_lines(
+        collector('tele metry,x=1'), 'building/Bldg A/ahu,1=\tb\r/telemetry',
+        {'p\n1': 'say "hi" \\ \n'})
+    assert lines == [
+        'tele\\ metry\\,x=1,building=Bldg\\ A,device=ahu\\,1\\=\\tb\\r,'
+        'point=p\\n1 text_value="say \\"hi\\" \\\\ \n" ' + str(TS)
+    ]
+
+
+def test_trailing_backslash_in_tag_value(collector):
+    """Test a tag value ending in a backslash cannot escape the separator"""
+    lines = written_lines(collector(), 'building/demo/ahu\\/telemetry',
+                          {'p': 1.0})
+    assert lines == [f'telemetry,building=demo,device=ahu\\ ,point=p value=1.0 {TS}']
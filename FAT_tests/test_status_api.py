@@ -0,0 +1,128 @@
+#!/usr/bin/env python3
+"""
+Tests for the FastAPI status backend's MQTT message cache
+
+USAGE EXAMPLE:
+pytest FAT_tests/test_status_api.py -v
+"""
+
+import asyncio
+import json
+import os
+import sys
+from collections import Counter
+from types import SimpleNamespace
+
+import msgpack
+import pytest
+from fastapi import HTTPException
+
+# Add parent directory to path to import backend modules
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from backend import status
+
+
+@pytest.fixture(autouse=True)
+def empty_cache():
+    """Start every test from an empty message cache"""
+    for cache in (status.last_messages, status.building_counts,
+                  status.device_counts, status.missing_topics):
+        cache.clear()
+    yield
+
+
+def telemetry(building, device, ts=0):
+    """A minimal telemetry payload"""
+    return {"ts": ts, "building": building, "device": device, "points": {}}
+
+
+def deliver(topic, raw):
+    """Feed one raw MQTT message to the status API's callback"""
+    status.on_message(None, None, SimpleNamespace(topic=topic, payload=raw))
+
+
+@pytest.mark.parametrize("encode", [
+    lambda payload: json.dumps(payload).encode(),
+    lambda payload: msgpack.packb(payload),
+], ids=["json", "msgpack"])
+def test_batched_payload_caches_each_item(encode):
+    """Test a list payload (publish_batch_size > 1) caches its newest item"""
+    topic = "building/demo_building/ahu1/telemetry"
+    deliver(topic, encode([telemetry("demo_building", "ahu1", ts)
+                           for ts in (1, 2, 3)]))
+
+    assert status.last_messages[topic].payload["ts"] == 3
+    assert status.building_counts == {"demo_building": 1}
+    assert status.device_counts == {"ahu1": 1}
+
+
+def recount():
+    """Building/device counts recomputed from scratch over the cache"""
+    payloads = [entry.payload for entry in status.last_messages.values()]
+    return (Counter(p.get("building", "unknown") for p in payloads),
+            Counter(p.get("device", "unknown") for p in payloads))
+
+
+def test_counts_match_cache_after_eviction_and_overwrites():
+    """Test running counts stay equal to a recount through LRU eviction"""
+    extra = 25
+    for i in range(status.MAX_CACHED_TOPICS + extra):
+        building = f"building_{i % 7}"
+        deliver(f"building/{building}/ahu{i}/telemetry",
+                json.dumps(telemetry(building, f"ahu{i % 11}")).encode())
+
+    # Overwrite some cached topics with a different building/device
+    for i in range(extra, extra + 50):
+        deliver(f"building/building_{i % 7}/ahu{i}/telemetry",
+                json.dumps(telemetry("moved_building", "moved_ahu")).encode())
+
+    assert len(status.last_messages) == status.MAX_CACHED_TOPICS
+    assert "building/building_0/ahu0/telemetry" not in status.last_messages
+    buildings, devices = recount()
+    assert status.building_counts == buildings
+    assert status.device_counts == devices
+    assert status.building_counts["moved_building"] == 50
+
+
+def test_topics_limit_and_total():
+    """Test /topics returns the most recent `limit` topics and the total"""
+    for i in range(5):
+        deliver(f"building/demo_building/ahu{i}/telemetry",
+                json.dumps(telemetry("demo_building", f"ahu{i}")).encode())
+
+    response = asyncio.run(status.list_topics(limit=2))
+    body = json.loads(response.body)
+
+    assert body["count"] == 2
+    assert body["total"] == 5
+    assert [t["device"] for t in body["topics"]] == ["ahu4", "ahu3"]
+
+
+def test_missing_topic_expires_after_ttl(monkeypatch):
+    """Test a negatively cached topic is queried again once its TTL passes"""
+    queries = []
+    monkeypatch.setattr(status, "influx_client", object())
+    monkeypatch.setattr(status, "query_api",
+                        SimpleNamespace(query=lambda q: queries.append(q) or []))
+    now = [1000.0]
+    monkeypatch.setattr(status.time, "monotonic", lambda: now[0])
+    topic = "building/demo_building/ahu9/telemetry"
+
+    def get_last():
+        with pytest.raises(HTTPException) as excinfo:
+            asyncio.run(status.get_last_message(topic=topic))
+        assert excinfo.value.status_code == 404
+
+    get_last()
+    assert len(queries) == 1
+    assert topic in status.missing_topics
+
+    # Within the TTL the miss is answered without touching InfluxDB
+    now[0] += status.MISSING_TOPIC_TTL - 1
+    get_last()
+    assert len(queries) == 1
+
+    now[0] += 2
+    get_last()
+    assert len(queries) == 2
@@ -0,0 +1,29 @@
+#!/usr/bin/env python3
+"""
+Tests for the pipeline verification script
+
+USAGE EXAMPLE:
+pytest FAT_tests/test_verify_pipeline.py -v
+"""
+
+import importlib
+import os
+import sys
+
+import pytest
+
+SCRIPTS_DIR = os.path.join(os.path.dirname(__file__), '..', 'scripts')
+
+
+def test_imports_without_aiohttp(monkeypatch):
+    """Test the script imports without aiohttp and only the HTTP checks fail"""
+    # A None entry in sys.modules makes `import aiohttp` raise ImportError
+    monkeypatch.setitem(sys.modules, 'aiohttp', None)
+    monkeypatch.delitem(sys.modules, 'verify_pipeline', raising=False)
+    monkeypatch.syspath_prepend(SCRIPTS_DIR)
+
+    verify_pipeline = importlib.import_module('verify_pipeline')
+
+    assert verify_pipeline.aiohttp is None
+    with pytest.raises(RuntimeError, match="aiohttp is not installed"):
+        verify_pipeline.TelemetryVerifier()._get_session()
@@ -6,24 +6,39 @@ curl http://localhost:8000/health
 curl "http://localhost:8000/last?topic=building/ahu1/telemetry"
 """
 
-import json
+import asyncio
+import itertools
 import logging
 import time
+from collections import Counter, OrderedDict
+from dataclasses import dataclass
 from typing import Dict, Any, Optional
 from datetime import datetime, timedelta
 import threading
+from functools import lru_cache
 import signal
 import sys
 
 from fastapi import FastAPI, Query, HTTPException
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import ORJSONResponse
 import uvicorn
+import orjson
+import msgpack
 import paho.mqtt.client as mqtt
 from influxdb_client import InfluxDBClient
 from influxdb_client.client.query_api import QueryApi
 import subprocess
 import os
 
+# Make the project root importable when run as `python backend/status.py`
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+try:
+    from replay.replay_bdg import run_replay_async
+except ImportError:
+    run_replay_async = None
+
 # Configure logging
 logging.basicConfig(
     level=logging.INFO,
@@ -31,12 +46,61 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
+
+@dataclass(slots=True)
+class CachedMessage:
+    """Last MQTT message seen on a topic"""
+    ts_ns: int  # Wall-clock receive time, only used for display
+    payload: Dict[str, Any]
+
+    def iso_timestamp(self) -> str:
+        """Receive time as a UTC ISO-8601 string"""
+        return datetime.utcfromtimestamp(self.ts_ns / 1e9).isoformat()
+
+
 # Global variables
-app = FastAPI(title="Telemetry Status API", version="1.0.0")
-last_messages: Dict[str, Dict[str, Any]] = {}
+app = FastAPI(title="Telemetry Status API", version="1.0.0",
+              default_response_class=ORJSONResponse)
+# MQTT message cache (LRU, most recent topic last). The paho network thread
+# is the only writer; API handlers only hold last_messages_lock for O(1)
+# lookups or an O(limit) slice, so a single lock is not a contention point
+# and keeps global LRU eviction and recency ordering exact.
+last_messages: "OrderedDict[str, CachedMessage]" = OrderedDict()
+last_messages_lock = threading.Lock()
+MAX_CACHED_TOPICS = 1000
+# Running per-building/device counts of cached topics, kept in sync with
+# last_messages under last_messages_lock
+building_counts: Counter = Counter()
+device_counts: Counter = Counter()
+# Topics recently confirmed absent from InfluxDB -> monotonic time of the miss
+missing_topics: "OrderedDict[str, float]" = OrderedDict()
+MISSING_TOPIC_TTL = 10.0
+MAX_MISSING_TOPICS = 1000
 influx_client: Optional[InfluxDBClient] = None
+query_api: Optional[QueryApi] = None
 mqtt_client: Optional[mqtt.Client] = None
 replay_process: Optional[subprocess.Popen] = None
+replay_task: Optional[asyncio.Task] = None
+# Replays run as an in-process asyncio task unless REPLAY_MODE=subprocess
+REPLAY_IN_PROCESS = (os.environ.get("REPLAY_MODE", "task") != "subprocess"
+                     and run_replay_async is not None)
+
+# Telemetry topic filters: building/<device>/telemetry (simulator) and
+# building/<building>/<device>/telemetry (replay)
+TELEMETRY_SUBSCRIPTIONS = [
+    ("building/+/telemetry", 0),
+    ("building/+/+/telemetry", 0),
+]
+
+# Flux query for the most recent point of a device, filled per request
+FLUX_LAST_TEMPLATE = '''
+from(bucket: "building_data")
+  |> range(start: -24h)
+  |> filter(fn: (r) => r._measurement == "telemetry")
+  |> filter(fn: (r) => r.building == "{building}")
+  |> filter(fn: (r) => r.device == "{device}")
+  |> last()
+'''
 
 # CORS middleware for frontend access
 app.add_middleware(
@@ -50,13 +114,15 @@ app.add_middleware(
 
 def setup_influxdb():
     """Setup InfluxDB client"""
-    global influx_client
+    global influx_client, query_api
     try:
         influx_client = InfluxDBClient(
             url="http://localhost:8086",
             token="telemetry-token-12345",
-            org="telemetry"
+            org="telemetry",
+            enable_gzip=True
         )
+        query_api = influx_client.query_api()
         # Test connection
         health = influx_client.health()
         if health.status == "pass":
@@ -67,6 +133,76 @@ def setup_influxdb():
         logger.error(f"Failed to connect to InfluxDB: {e}")
 
 
+@lru_cache(maxsize=4096)
+def _parse_topic(topic: str):
+    """Split a building/<building>/<device>/... topic into (building, device)"""
+    parts = topic.split('/')
+    if len(parts) >= 3:
+        return parts[1], parts[2]
+    return None, None
+
+
+def _decode_payload(raw: bytes) -> Any:
+    """Decode a telemetry payload: a JSON or msgpack object, or a list of them"""
+    if raw[:1] in (b'{', b'['):
+        return orjson.loads(raw)
+    return msgpack.unpackb(raw, raw=False)
+
+
+def _remember_missing(topic: str) -> None:
+    """Record that InfluxDB has no data for a topic (bounded LRU)"""
+    missing_topics[topic] = time.monotonic()
+    missing_topics.move_to_end(topic)
+    while len(missing_topics) > MAX_MISSING_TOPICS:
+        missing_topics.popitem(last=False)
+
+
+def _discount_entry(entry: CachedMessage) -> None:
+    """Remove a cached entry from the running building/device counts"""
+    payload = entry.payload
+    for counts, key in ((building_counts, payload.get("building", "unknown")),
+                        (device_counts, payload.get("device", "unknown"))):
+        counts[key] -= 1
+        if counts[key] <= 0:
+            del counts[key]
+
+
+def _cache_message(topic: str, payload: Dict[str, Any]) -> None:
+    """Make payload the last message for topic and update the running counts"""
+    entry = CachedMessage(time.time_ns(), payload)
+    building = payload.get("building", "unknown")
+    device = payload.get("device", "unknown")
+
+    with last_messages_lock:
+        previous = last_messages.get(topic)
+        if previous is not None:
+            _discount_entry(previous)
+
+        # Store last message for each topic, most recent at the end
+        last_messages[topic] = entry
+        last_messages.move_to_end(topic)
+        building_counts[building] += 1
+        device_counts[device] += 1
+
+        # Limit cache size to prevent memory issues (evict LRU)
+        while len(last_messages) > MAX_CACHED_TOPICS:
+            _, evicted = last_messages.popitem(last=False)
+            _discount_entry(evicted)
+
+
+def on_message(client, userdata, msg):
+    """MQTT message callback: cache the latest telemetry per topic"""
+    try:
+        payload = _decode_payload(msg.payload)
+        # Simulators with publish_batch_size > 1 send a list of payloads,
+        # oldest first, so the newest ends up cached
+        for item in payload if isinstance(payload, list) else (payload,):
+            _cache_message(msg.topic, item)
+
+    except Exception as e:
+        logger.error(f"Error processing MQTT message: {e}")
+
+
 def setup_mqtt():
     """Setup MQTT client for real-time message tracking"""
     global mqtt_client
@@ -74,33 +210,10 @@ def setup_mqtt():
     def on_connect(client, userdata, flags, rc):
         if rc == 0:
             logger.info("Connected to MQTT broker")
-            client.subscribe("building/#")
+            client.subscribe(TELEMETRY_SUBSCRIPTIONS)
         else:
             logger.error(f"Failed to connect to MQTT broker: {rc}")
 
-    def on_message(client, userdata, msg):
-        try:
-            topic = msg.topic
-            payload = json.loads(msg.payload.decode('utf-8'))
-
-            # Store last message for each topic
-            last_messages[topic] = {
-                "timestamp": datetime.utcnow().isoformat(),
-                "topic": topic,
-                "payload": payload
-            }
-
-            # Limit cache size to prevent memory issues
-            if len(last_messages) > 1000:
-                # Remove oldest entries
-                oldest_topics = sorted(last_messages.keys(),
-                                       key=lambda k: last_messages[k]["timestamp"])[:100]
-                for old_topic in oldest_topics:
-                    del last_messages[old_topic]
-
-        except Exception as e:
-            logger.error(f"Error processing MQTT message: {e}")
-
     try:
         mqtt_client = mqtt.Client()
         mqtt_client.on_connect = on_connect
@@ -128,6 +241,9 @@ async def shutdown_event():
     if influx_client:
         influx_client.close()
 
+    if replay_task and not replay_task.done():
+        replay_task.cancel()
+
     if replay_process:
         replay_process.terminate()
 
@@ -152,31 +268,34 @@ async def get_last_message(topic: str = Query(..., description="MQTT topic to qu
     """Get last received message for a topic"""
 
     # First check in-memory cache
-    if topic in last_messages:
-        return last_messages[topic]
+    with last_messages_lock:
+        cached = last_messages.get(topic)
+    if cached is not None:
+        # Returning the response directly skips FastAPI's jsonable_encoder pass
+        return ORJSONResponse({
+            "timestamp": cached.iso_timestamp(),
+            "topic": topic,
+            "payload": cached.payload
+        })
+
+    # Skip InfluxDB for topics that came back empty within the TTL
+    missed_at = missing_topics.get(topic)
+    if missed_at is not None and time.monotonic() - missed_at < MISSING_TOPIC_TTL:
+        raise HTTPException(
+            status_code=404, detail=f"No data found for topic: {topic}")
 
     # If not in cache, try to get from InfluxDB
-    if influx_client:
+    if influx_client and query_api:
         try:
-            query_api = influx_client.query_api()
-
             # Parse topic to extract building and device
-            topic_parts = topic.split('/')
-            if len(topic_parts) >= 3:
-                building = topic_parts[1]
-                device = topic_parts[2]
-
+            building, device = _parse_topic(topic)
+            if building is not None:
                 # Query InfluxDB for last point
-                query = f'''
-                from(bucket: "building_data")
-                  |> range(start: -24h)
-                  |> filter(fn: (r) => r._measurement == "telemetry")
-                  |> filter(fn: (r) => r.building == "{building}")
-                  |> filter(fn: (r) => r.device == "{device}")
-                  |> last()
-                '''
+                query = FLUX_LAST_TEMPLATE.format_map(
+                    {"building": building, "device": device})
 
-                result = query_api.query(query)
+                # Blocking HTTP call, keep it off the event loop
+                result = await asyncio.to_thread(query_api.query, query)
 
                 if result:
                     # Convert InfluxDB result to telemetry format
@@ -201,6 +320,8 @@ async def get_last_message(topic: str = Query(..., description="MQTT topic to qu
                             }
                         }
 
+                _remember_missing(topic)
+
         except Exception as e:
             logger.error(f"Error querying InfluxDB: {e}")
 
@@ -209,33 +330,67 @@ async def get_last_message(topic: str = Query(..., description="MQTT topic to qu
 
 
 @app.get("/topics")
-async def list_topics():
-    """List all topics with recent messages"""
+async def list_topics(
+        limit: int = Query(50, ge=1, le=MAX_CACHED_TOPICS,
+                           description="Maximum number of topics to return")):
+    """List the most recently updated topics"""
+    with last_messages_lock:
+        total = len(last_messages)
+        # LRU order already keeps the most recent topic at the end
+        cached = list(itertools.islice(reversed(last_messages.items()), limit))
+
     topics = []
-    for topic, data in last_messages.items():
+    for topic, data in cached:
         topics.append({
             "topic": topic,
-            "last_seen": data["timestamp"],
-            "device": data["payload"].get("device", "unknown"),
-            "building": data["payload"].get("building", "unknown")
+            "last_seen": data.iso_timestamp(),
+            "device": data.payload.get("device", "unknown"),
+            "building": data.payload.get("building", "unknown")
         })
 
-    # Sort by last seen (most recent first)
-    topics.sort(key=lambda x: x["last_seen"], reverse=True)
-    return {"topics": topics, "count": len(topics)}
+    return ORJSONResponse({"topics": topics, "count": len(topics), "total": total})
+
+
+async def _stop_replay_task() -> bool:
+    """Cancel the in-process replay task, returns True if it was running"""
+    if replay_task is None or replay_task.done():
+        return False
+
+    replay_task.cancel()
+    try:
+        await replay_task
+    except asyncio.CancelledError:
+        pass
+    except Exception as e:
+        logger.error(f"Replay task failed while stopping: {e}")
+    return True
 
 
 @app.post("/replay/start")
 async def start_replay(file_path: str = Query(...), speed: float = Query(1.0)):
     """Start replay of CSV file"""
-    global replay_process
+    global replay_process, replay_task
 
     # Stop existing replay if running
+    await _stop_replay_task()
     if replay_process and replay_process.poll() is None:
         replay_process.terminate()
         replay_process.wait()
 
     try:
+        if REPLAY_IN_PROCESS:
+            replay_task = asyncio.create_task(
+                run_replay_async(file_path, speed, "building"))
+
+            logger.info(f"Started replay task: {file_path} at {speed}x speed")
+
+            return {
+                "status": "started",
+                "file_path": file_path,
+                "speed": speed,
+                "pid": None
+            }
+
         # Build command
         cmd = [
             "python", "replay/replay_bdg.py",
@@ -270,6 +425,10 @@ async def start_replay(file_path: str = Query(...), speed: float = Query(1.0)):
 @app.post("/replay/stop")
 async def stop_replay():
     """Stop running replay"""
+    if await _stop_replay_task():
+        logger.info("Replay stopped")
+        return {"status": "stopped"}
+
     if replay_process and replay_process.poll() is None:
         try:
             replay_process.terminate()
@@ -286,8 +445,16 @@ async def stop_replay():
 
 @app.get("/replay/status")
 async def replay_status():
-    """Get replay process status"""
-    if replay_process:
+    """Get replay task or process status"""
+    if replay_task:
+        if not replay_task.done():
+            return {"status": "running", "pid": None}
+        failed = replay_task.cancelled() or replay_task.exception() is not None
+        return {
+            "status": "finished",
+            "return_code": 1 if failed else 0
+        }
+    elif replay_process:
         if replay_process.poll() is None:
             return {
                 "status": "running",
@@ -315,17 +482,11 @@ async def get_statistics():
     }
 
     # Add building/device counts
-    buildings = set()
-    devices = set()
-    for topic_data in last_messages.values():
-        payload = topic_data.get("payload", {})
-        buildings.add(payload.get("building", "unknown"))
-        devices.add(payload.get("device", "unknown"))
-
-    stats["unique_buildings"] = len(buildings)
-    stats["unique_devices"] = len(devices)
+    with last_messages_lock:
+        stats["unique_buildings"] = len(building_counts)
+        stats["unique_devices"] = len(device_counts)
 
-    return stats
+    return ORJSONResponse(stats)
 
 
 def signal_handler(signum, frame):
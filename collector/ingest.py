@@ -5,17 +5,19 @@ python collector/ingest.py --config collector/config.yaml
 """
 
 import argparse
-import json
 import logging
+import math
 import signal
 import sys
 import time
-from typing import Dict, Any, Optional
+from functools import lru_cache
+from typing import Dict, Any, Optional, Tuple
 import yaml
+import msgpack
+import orjson
 import paho.mqtt.client as mqtt
-from influxdb_client import InfluxDBClient, Point, WritePrecision
-from influxdb_client.client.write_api import SYNCHRONOUS
-from datetime import datetime
+from influxdb_client import InfluxDBClient, WritePrecision
+from influxdb_client.client.write_api import WriteOptions
 
 # Configure logging
 logging.basicConfig(
@@ -25,6 +27,65 @@ logging.basicConfig(
 logger = logging.getLogger(__name__)
 
 
+# Line protocol escaping, as in influxdb_client.client.write.point (which the
+# collector used to build lines with)
+_ESCAPE_MEASUREMENT = str.maketrans({
+    ',': r'\,',
+    ' ': r'\ ',
+    '\n': r'\n',
+    '\t': r'\t',
+    '\r': r'\r',
+})
+_ESCAPE_KEY = str.maketrans({
+    ',': r'\,',
+    '=': r'\=',
+    ' ': r'\ ',
+    '\n': r'\n',
+    '\t': r'\t',
+    '\r': r'\r',
+})
+_ESCAPE_STRING = str.maketrans({
+    '"': r'\"',
+    '\\': r'\\',
+})
+
+# Upper bound on cached line protocol prefixes before the cache is reset
+MAX_LINE_TEMPLATES = 10000
+
+
+def _escape_measurement(value: str) -> str:
+    """Escape a measurement name for line protocol"""
+    return str(value).translate(_ESCAPE_MEASUREMENT)
+
+
+def _escape_key(value: str) -> str:
+    """Escape a tag key for line protocol"""
+    return str(value).translate(_ESCAPE_KEY)
+
+
+def _escape_tag_value(value: str) -> str:
+    """Escape a tag value; a trailing backslash must not escape the separator"""
+    escaped = _escape_key(value)
+    if escaped.endswith('\\'):
+        escaped += ' '
+    return escaped
+
+
+def _escape_string(value: str) -> str:
+    """Escape a string field value for line protocol"""
+    return value.translate(_ESCAPE_STRING)
+
+
+@lru_cache(maxsize=4096)
+def _parse_topic(topic: str):
+    """Split a building/<building>/<device>/... topic into (building, device)"""
+    try:
+        _, building, device, *_ = topic.split('/', 3)
+    except ValueError:
+        return None, None
+    return building, device
+
+
 class TelemetryCollector:
     """MQTT to InfluxDB telemetry collector"""
 
@@ -35,6 +96,15 @@ class TelemetryCollector:
         self.write_api = None
         self.running = False
 
+        # Line protocol prefix up to the field '=' for each
+        # (building, device, point, field) seen; only the config can change
+        # the measurement, so it is resolved once here
+        self.measurement = config.get('influxdb', {}).get(
+            'measurement', 'telemetry')
+        self.bucket = config.get('influxdb', {}).get(
+            'bucket', 'building_data')
+        self._line_templates: Dict[Tuple[str, str, str, str], str] = {}
+
         # Initialize connections
         self._setup_influxdb()
         self._setup_mqtt()
@@ -47,11 +117,21 @@ class TelemetryCollector:
             self.influx_client = InfluxDBClient(
                 url=influx_config.get('url', 'http://localhost:8086'),
                 token=influx_config.get('token', 'telemetry-token-12345'),
-                org=influx_config.get('org', 'telemetry')
+                org=influx_config.get('org', 'telemetry'),
+                enable_gzip=True
             )
 
+            # Batch points in the background and ship them in one HTTP POST
+            # per batch instead of one synchronous request per message
             self.write_api = self.influx_client.write_api(
-                write_options=SYNCHRONOUS)
+                write_options=WriteOptions(
+                    batch_size=influx_config.get('batch_size', 5000),
+                    flush_interval=influx_config.get('flush_interval', 1000),
+                    jitter_interval=influx_config.get('jitter_interval', 200),
+                    retry_interval=5000,
+                    max_retries=3,
+                    max_retry_delay=30000,
+                    exponential_base=2))
 
             # Test connection
             health = self.influx_client.health()
@@ -85,8 +165,13 @@ class TelemetryCollector:
         if rc == 0:
             logger.info("Connected to MQTT broker")
             # Subscribe to building telemetry topics
-            topic_pattern = self.config.get('mqtt', {}).get(
-                'topic_pattern', 'building/#')
+            mqtt_config = self.config.get('mqtt', {})
+            topic_pattern = mqtt_config.get('topic_pattern', 'building/#')
+            # With a shared group the broker load-balances messages across
+            # every collector process subscribed under that group
+            shared_group = mqtt_config.get('shared_group')
+            if shared_group:
+                topic_pattern = f"$share/{shared_group}/{topic_pattern}"
             client.subscribe(topic_pattern)
             logger.info(f"Subscribed to topic pattern: {topic_pattern}")
         else:
@@ -101,16 +186,26 @@ class TelemetryCollector:
         try:
             # Parse the message
             topic = msg.topic
-            payload = json.loads(msg.payload.decode('utf-8'))
+            if msg.payload[:1] in (b'{', b'['):
+                payload = orjson.loads(msg.payload)
+            else:
+                # Binary telemetry published with payload_format: msgpack
+                payload = msgpack.unpackb(msg.payload, raw=False)
 
-            logger.debug(f"Received message on topic {topic}: {payload}")
+            if logger.isEnabledFor(logging.DEBUG):
+                logger.debug(f"Received message on topic {topic}: {payload}")
 
-            # Write to InfluxDB
-            self._write_to_influxdb(topic, payload)
+            # Write to InfluxDB; simulators with publish_batch_size > 1 send
+            # a list of payloads per message
+            if isinstance(payload, list):
+                for item in payload:
+                    self._write_to_influxdb(topic, item)
+            else:
+                self._write_to_influxdb(topic, payload)
 
-        except json.JSONDecodeError as e:
+        except ValueError as e:  # JSONDecodeError and msgpack format errors
             logger.error(
-                f"Failed to parse JSON payload from topic {topic}: {e}")
+                f"Failed to parse payload from topic {topic}: {e}")
         except Exception as e:
             logger.error(f"Error processing message from topic {topic}: {e}")
 
@@ -122,77 +217,82 @@ class TelemetryCollector:
                 return
 
             # Extract topic parts for tags
-            topic_parts = topic.split('/')
-            if len(topic_parts) >= 3:
-                building = topic_parts[1] if len(
-                    topic_parts) > 1 else 'unknown'
-                device = topic_parts[2] if len(topic_parts) > 2 else 'unknown'
-            else:
+            building, device = _parse_topic(topic)
+            if building is None:
                 building = payload.get('building', 'unknown')
                 device = payload.get('device', 'unknown')
 
-            # Get timestamp
+            # Get timestamp (epoch milliseconds)
             timestamp = payload.get('ts')
-            if timestamp:
-                # Convert from milliseconds to datetime
-                dt = datetime.fromtimestamp(timestamp / 1000.0)
-            else:
-                dt = datetime.utcnow()
+            if not timestamp:
+                timestamp = time.time_ns() // 1_000_000
 
-            # Get measurement name
-            measurement = self.config.get('influxdb', {}).get(
-                'measurement', 'telemetry')
-            bucket = self.config.get('influxdb', {}).get(
-                'bucket', 'building_data')
+            suffix = f" {int(timestamp)}"
+            templates = self._line_templates
 
-            # Create points for each telemetry field
-            points = []
+            # Create one line per telemetry field
+            lines = []
             points_data = payload.get('points', {})
 
             for point_name, value in points_data.items():
-                if value is not None:
-                    point = Point(measurement) \
-                        .tag("building", building) \
-                        .tag("device", device) \
-                        .tag("point", point_name) \
-                        .time(dt, WritePrecision.MS)
-
-                    # Handle different data types with separate field names to avoid conflicts
-                    if isinstance(value, (int, float)):
-                        point = point.field("value", float(value))
-                    elif isinstance(value, str):
-                        # Different field name for strings
-                        point = point.field("text_value", value)
-                    elif isinstance(value, bool):
-                        # Different field name for booleans
-                        point = point.field("bool_value", value)
-                    else:
-                        # Convert unknown types to string
-                        point = point.field("text_value", str(value))
-
-                    points.append(point)
+                if value is None:
+                    continue
+
+                # Handle different data types with separate field names to avoid conflicts
+                if isinstance(value, bool):
+                    # Different field name for booleans
+                    field = 'bool_value'
+                    field_value = 'true' if value else 'false'
+                elif isinstance(value, (int, float)):
+                    if not math.isfinite(value):
+                        continue  # NaN/inf are not representable in line protocol
+                    field = 'value'
+                    field_value = repr(float(value))
+                else:
+                    # Different field name for strings (unknown types as str)
+                    field = 'text_value'
+                    field_value = f'"{_escape_string(str(value))}"'
+
+                key = (building, device, point_name, field)
+                template = templates.get(key)
+                if template is None:
+                    template = self._line_template(*key)
+
+                lines.append(template + field_value + suffix)
 
             # Write points to InfluxDB
-            if points:
-                self.write_api.write(bucket=bucket, record=points)
-                logger.debug(
-                    f"Written {len(points)} points to InfluxDB for device {device}")
+            if lines:
+                self.write_api.write(bucket=self.bucket, record=lines,
+                                     write_precision=WritePrecision.MS)
+                if logger.isEnabledFor(logging.DEBUG):
+                    logger.debug(
+                        f"Queued {len(lines)} points for InfluxDB for device {device}")
 
         except Exception as e:
             logger.error(f"Failed to write to InfluxDB: {e}")
 
+    def _line_template(self, building: str, device: str, point_name: str,
+                       field: str) -> str:
+        """Build and cache the escaped line protocol prefix for a series field"""
+        if len(self._line_templates) >= MAX_LINE_TEMPLATES:
+            self._line_templates.clear()
+
+        template = (f"{_escape_measurement(self.measurement)},"
+                    f"building={_escape_tag_value(building) or 'unknown'},"
+                    f"device={_escape_tag_value(device) or 'unknown'},"
+                    f"point={_escape_tag_value(point_name)} {field}=")
+        self._line_templates[(building, device, point_name, field)] = template
+        return template
+
     def run(self) -> None:
         """Start the collector service"""
         logger.info("Starting telemetry collector")
         self.running = True
 
         try:
-            # Start MQTT loop
-            self.mqtt_client.loop_start()
-
-            # Keep the main thread alive
-            while self.running:
-                time.sleep(1)
+            # Run the MQTT network loop on this thread; it handles reconnects
+            # and returns once stop() disconnects the client
+            self.mqtt_client.loop_forever()
 
         except KeyboardInterrupt:
             logger.info("Received interrupt signal")
@@ -210,6 +310,10 @@ class TelemetryCollector:
             self.mqtt_client.loop_stop()
             self.mqtt_client.disconnect()
 
+        if self.write_api:
+            # Flush any points still waiting in the batch buffer
+            self.write_api.close()
+
         if self.influx_client:
             self.influx_client.close()
 
@@ -6,15 +6,23 @@ python replay/replay_bdg.py --file replay/samples/sample_electricity.csv --speed
 """
 
 import argparse
+import asyncio
+import bisect
 import csv
-import json
+import itertools
 import logging
 import time
 import signal
 import sys
-from typing import Dict, Any, Optional, List
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, Any, Optional, List, Iterable, Iterator, Tuple
 from datetime import datetime, timedelta
+import numpy as np
+import orjson
 import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.csv as pacsv
 import paho.mqtt.client as mqtt
 import os
 
@@ -25,6 +33,25 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
+# Messages scheduled per batch when replaying a stream
+CSV_CHUNKSIZE = 50_000
+
+# Bytes of CSV text parsed per Arrow record batch when streaming files
+CSV_BLOCK_SIZE = 16 << 20
+
+# Points between replay progress log lines
+PROGRESS_LOG_INTERVAL = 1000
+
+# Pre-serialized replay message: (timestamp ms, MQTT topic, JSON payload)
+Message = Tuple[int, str, bytes]
+
+
+def _sample_csv(source_path: str, output_path: str, num_rows: int) -> int:
+    """Copy the first num_rows of a CSV file; runs in a worker process"""
+    df = pd.read_csv(source_path, nrows=num_rows)
+    df.to_csv(output_path, index=False)
+    return len(df)
+
 
 class BDGReplay:
     """Building Data Genome Project CSV replay tool"""
@@ -76,43 +103,80 @@ class BDGReplay:
             'weather.csv'
         ]
 
+        jobs = {}
         for csv_file in csv_files:
             source_path = os.path.join(source_dir, csv_file)
             output_path = os.path.join(output_dir, f"sample_{csv_file}")
 
             if os.path.exists(source_path):
+                jobs[csv_file] = (source_path, output_path)
+            else:
+                logger.warning(f"Source file not found: {source_path}")
+
+        if not jobs:
+            return
+
+        # pandas parsing is CPU-bound; sample each file in its own process
+        with ProcessPoolExecutor(max_workers=len(jobs)) as executor:
+            futures = {
+                csv_file: executor.submit(
+                    _sample_csv, source_path, output_path, num_rows)
+                for csv_file, (source_path, output_path) in jobs.items()
+            }
+            for csv_file, future in futures.items():
+                output_path = jobs[csv_file][1]
                 try:
-                    # Read first num_rows of the CSV
-                    df = pd.read_csv(source_path, nrows=num_rows)
-                    df.to_csv(output_path, index=False)
+                    rows = future.result()
                     logger.info(
-                        f"Created sample file: {output_path} ({len(df)} rows)")
+                        f"Created sample file: {output_path} ({rows} rows)")
                 except Exception as e:
                     logger.error(
                         f"Failed to create sample for {csv_file}: {e}")
-            else:
-                logger.warning(f"Source file not found: {source_path}")
 
     def parse_csv_data(self, file_path: str) -> List[Dict[str, Any]]:
         """Parse CSV data and convert to telemetry format"""
-        logger.info(f"Parsing CSV file: {file_path}")
+        data_points = list(self.iter_csv_data(file_path))
+        logger.info(f"Parsed {len(data_points)} data points")
+        return data_points
 
-        data_points = []
+    def iter_csv_data(self, file_path: str,
+                      block_size: int = CSV_BLOCK_SIZE) -> Iterator[Dict[str, Any]]:
+        """Stream telemetry payloads from a CSV file chunk by chunk
+
+        Only one block of rows is held in memory at a time. Payloads are
+        yielded in timestamp order as long as the file itself is time-sorted
+        (BDG exports are).
+        """
+        for records in self._iter_csv_chunks(file_path, block_size):
+            yield from records
+
+    def iter_csv_messages(self, file_path: str, topic_prefix: str = "building",
+                          block_size: int = CSV_BLOCK_SIZE) -> Iterator[Message]:
+        """Stream pre-serialized replay messages from a CSV file
+
+        Each chunk is encoded in one pass as soon as it is parsed, so the
+        replay loop never serializes on its timing path.
+        """
+        for records in self._iter_csv_chunks(file_path, block_size):
+            yield from self.encode_messages(records, topic_prefix)
+
+    def _iter_csv_chunks(self, file_path: str,
+                         block_size: int) -> Iterator[List[Dict[str, Any]]]:
+        """Parse a CSV file into lists of telemetry payloads, one per block"""
+        logger.info(f"Parsing CSV file: {file_path}")
 
         try:
-            df = pd.read_csv(file_path)
+            with open(file_path, newline='') as f:
+                columns = next(csv.reader(f), [])
 
             # Handle different CSV formats
-            if 'timestamp' in df.columns:
+            if 'timestamp' in columns:
                 timestamp_col = 'timestamp'
-            elif 'ts' in df.columns:
+            elif 'ts' in columns:
                 timestamp_col = 'ts'
             else:
                 logger.error("No timestamp column found in CSV")
-                return []
-
-            # Convert timestamp to datetime
-            df[timestamp_col] = pd.to_datetime(df[timestamp_col])
+                return
 
             # Determine file type from filename
             filename = os.path.basename(file_path).lower()
@@ -127,113 +191,261 @@ class BDGReplay:
             else:
                 meter_type = 'unknown'
 
-            # Process each row
-            for _, row in df.iterrows():
-                timestamp = row[timestamp_col]
-                ts_ms = int(timestamp.timestamp() * 1000)
+            # Fix every column type up front: the streaming reader infers
+            # types from the first block only, and BDG meter columns are
+            # often empty for months before their first reading
+            column_types = {col: pa.float64() for col in columns}
+            column_types[timestamp_col] = pa.timestamp('ms')
+            if 'site_id' in column_types:
+                column_types['site_id'] = pa.string()
+
+            reader = pacsv.open_csv(
+                file_path,
+                read_options=pacsv.ReadOptions(block_size=block_size),
+                convert_options=pacsv.ConvertOptions(column_types=column_types))
+
+            for batch in reader:
+                batch = batch.filter(pc.is_valid(batch.column(timestamp_col)))
+                if batch.num_rows == 0:
+                    continue
+
+                # Epoch milliseconds straight from the Arrow buffer
+                ts_ms = batch.column(timestamp_col).cast(
+                    pa.int64()).to_numpy()
+                df = batch.to_pandas()
 
-                # Extract building/device columns (skip timestamp)
-                points = {}
-                for col in df.columns:
-                    if col != timestamp_col and pd.notna(row[col]):
-                        points[col] = float(row[col]) if isinstance(
-                            row[col], (int, float)) else str(row[col])
-
-                # Create telemetry payload for each building/meter
                 if meter_type == 'weather':
-                    # Weather data - single device
-                    data_point = {
-                        "ts": ts_ms,
-                        "device": "weather_station",
-                        "building": row.get('site_id', 'unknown_site'),
-                        "points": {k: v for k, v in points.items() if k != 'site_id'}
-                    }
-                    data_points.append(data_point)
+                    yield self._weather_records(df, timestamp_col, ts_ms)
                 else:
-                    # Energy meter data - multiple buildings/meters per row
-                    for col, value in points.items():
-                        if pd.notna(value) and col != 'site_id':
-                            building_device = col.split('_', 2)
-                            if len(building_device) >= 3:
-                                building = building_device[0]
-                                device_type = building_device[1]
-                                device_name = building_device[2]
-                                device_id = f"{building}_{device_type}_{device_name}"
-
-                                data_point = {
-                                    "ts": ts_ms,
-                                    "device": device_id,
-                                    "building": building,
-                                    "points": {
-                                        meter_type: value,
-                                        "meter_type": meter_type
-                                    }
-                                }
-                                data_points.append(data_point)
+                    yield self._meter_records(
+                        df, timestamp_col, ts_ms, meter_type)
 
         except Exception as e:
             logger.error(f"Error parsing CSV file: {e}")
 
-        logger.info(f"Parsed {len(data_points)} data points")
+    def _weather_records(self, df: pd.DataFrame, timestamp_col: str,
+                         ts_ms) -> List[Dict[str, Any]]:
+        """Weather data - one weather_station payload per row"""
+        if 'site_id' in df.columns:
+            sites = df['site_id'].tolist()
+        else:
+            sites = ['unknown_site'] * len(df)
+
+        # Reader pins weather columns to float64, so NaN (v != v) is the
+        # only missing marker and rows can come straight from the array
+        values = df.drop(columns=[timestamp_col, 'site_id'], errors='ignore')
+        columns = values.columns.tolist()
+        rows = values.to_numpy(dtype=np.float64).tolist()
+
+        data_points = []
+        for ts, site, row in zip(ts_ms.tolist(), sites, rows):
+            points = {k: v for k, v in zip(columns, row) if v == v}
+            data_points.append({
+                "ts": ts,
+                "device": "weather_station",
+                "building": site,
+                "points": points
+            })
         return data_points
 
-    def replay_data(self, data_points: List[Dict[str, Any]], speed: float = 1.0,
-                    topic_prefix: str = "building") -> None:
-        """Replay data points to MQTT with time acceleration"""
-        if not data_points:
+    def _meter_records(self, df: pd.DataFrame, timestamp_col: str, ts_ms,
+                       meter_type: str) -> List[Dict[str, Any]]:
+        """Energy meter data - one payload per building/meter column per row"""
+        # Columns named <building>_<type>_<name>; the device id is the column
+        meter_cols = [col for col in df.columns
+                      if col not in (timestamp_col, 'site_id')
+                      and len(str(col).split('_', 2)) >= 3]
+        if not meter_cols:
+            return []
+
+        # Coordinates of every non-empty reading, in row-major (time) order;
+        # avoids materializing a long-form copy of the block
+        values = df[meter_cols].to_numpy(dtype=np.float64)
+        rows, cols = np.nonzero(~np.isnan(values))
+
+        ts_list = ts_ms.tolist()
+        buildings = [str(col).split('_', 1)[0] for col in meter_cols]
+
+        return [{
+            "ts": ts_list[row],
+            "device": meter_cols[col],
+            "building": buildings[col],
+            "points": {
+                meter_type: value,
+                "meter_type": meter_type
+            }
+        } for row, col, value in zip(rows.tolist(), cols.tolist(),
+                                     values[rows, cols].tolist())]
+
+    def encode_messages(self, data_points: Iterable[Dict[str, Any]],
+                        topic_prefix: str = "building") -> List[Message]:
+        """Serialize data points into (ts, topic, payload) replay messages"""
+        dumps = orjson.dumps
+        option = orjson.OPT_SERIALIZE_NUMPY
+        return [(data_point['ts'],
+                 f"{topic_prefix}/{data_point.get('building', 'unknown')}/"
+                 f"{data_point.get('device', 'unknown')}/telemetry",
+                 dumps(data_point, option=option))
+                for data_point in data_points]
+
+    def replay_data(self, messages: Iterable[Message], speed: float = 1.0) -> None:
+        """Replay pre-serialized messages to MQTT with time acceleration
+
+        Lists are scheduled as a single batch; other iterables (such as
+        iter_csv_messages) are consumed lazily in CSV_CHUNKSIZE batches and
+        must already be time-ordered across batches.
+        """
+        total = len(messages) if isinstance(messages, list) else None
+        start_time = None
+        first_ts = 0
+        index = 0
+
+        for batch in self._message_batches(messages):
+            ts_arr, topics, payloads = self._to_arrays(batch)
+            if start_time is None:
+                logger.info(
+                    f"Starting replay of {total if total is not None else 'streamed'} points with {speed}x speed")
+                self.running = True
+                start_time = time.time()
+                first_ts = ts_arr[0]
+
+            # Target offset from start_time of every message, in seconds
+            schedule = self._build_schedule(ts_arr, first_ts, speed)
+
+            i = 0
+            try:
+                while i < len(schedule) and self.running:
+                    # Publish everything already due in one burst, otherwise
+                    # wait for the next message
+                    elapsed = time.time() - start_time
+                    due = bisect.bisect_right(schedule, elapsed, lo=i)
+                    if due == i:
+                        time.sleep(schedule[i] - elapsed)
+                        continue
+
+                    self._publish_range(topics, payloads, i, due, index, total)
+                    i = due
+            except KeyboardInterrupt:
+                logger.info("Received interrupt signal")
+                self.running = False
+            index += i
+
+            if not self.running:
+                break
+
+        if start_time is None:
             logger.error("No data points to replay")
             return
 
-        logger.info(
-            f"Starting replay of {len(data_points)} points with {speed}x speed")
-        self.running = True
-
-        # Sort data points by timestamp
-        data_points.sort(key=lambda x: x['ts'])
+        logger.info("Replay completed")
+        self.stop()
 
-        start_time = time.time()
-        first_timestamp = data_points[0]['ts'] / 1000.0  # Convert to seconds
+    async def replay_data_async(self, messages: Iterable[Message],
+                                speed: float = 1.0) -> int:
+        """Replay pre-serialized messages to MQTT from an asyncio task
+
+        Same schedule as replay_data, but waits with asyncio.sleep so it can
+        run inside an event loop and be stopped by cancelling the task.
+        Streamed messages (such as iter_csv_messages) are pulled one batch at
+        a time in a worker thread, so CSV parsing never blocks the loop.
+        Returns the number of messages published; the caller stops the
+        client.
+        """
+        total = len(messages) if isinstance(messages, list) else None
+        batches = self._message_batches(messages)
+        start_time = None
+        first_ts = 0
+        index = 0
+        self.running = True
 
-        for i, data_point in enumerate(data_points):
-            if not self.running:
-                break
+        try:
+            while self.running:
+                batch = await asyncio.to_thread(next, batches, None)
+                if batch is None:
+                    break
+                ts_arr, topics, payloads = self._to_arrays(batch)
+                if start_time is None:
+                    logger.info(
+                        f"Starting replay of {total if total is not None else 'streamed'} points with {speed}x speed")
+                    start_time = time.time()
+                    first_ts = ts_arr[0]
+
+                schedule = self._build_schedule(ts_arr, first_ts, speed)
+
+                i = 0
+                while i < len(schedule) and self.running:
+                    elapsed = time.time() - start_time
+                    due = bisect.bisect_right(schedule, elapsed, lo=i)
+                    if due == i:
+                        await asyncio.sleep(schedule[i] - elapsed)
+                        continue
+
+                    self._publish_range(topics, payloads, i, due, index, total)
+                    i = due
+                    # Yield between bursts so a long catch-up can't starve the loop
+                    await asyncio.sleep(0)
+                index += i
+        except asyncio.CancelledError:
+            logger.info("Replay cancelled")
+            raise
+
+        if start_time is None:
+            logger.error("No data points to replay")
+        else:
+            logger.info("Replay completed")
+        return index
+
+    @staticmethod
+    def _message_batches(messages: Iterable[Message]) -> Iterator[List[Message]]:
+        """Split messages into batches for scheduling; a list is one batch"""
+        if isinstance(messages, list):
+            if messages:
+                yield messages
+            return
 
+        message_iter = iter(messages)
+        while True:
+            batch = list(itertools.islice(message_iter, CSV_CHUNKSIZE))
+            if not batch:
+                return
+            yield batch
+
+    @staticmethod
+    def _to_arrays(messages: List[Message]) -> Tuple[np.ndarray, List[str], List[bytes]]:
+        """Convert messages to parallel timestamp/topic/payload arrays in time order"""
+        ts_arr = np.fromiter((m[0] for m in messages), dtype=np.int64,
+                             count=len(messages))
+        order = np.argsort(ts_arr, kind='stable')
+        ordered = [messages[i] for i in order.tolist()]
+        return (ts_arr[order],
+                [m[1] for m in ordered],
+                [m[2] for m in ordered])
+
+    @staticmethod
+    def _build_schedule(ts_arr: np.ndarray, first_ts: int, speed: float) -> List[float]:
+        """Seconds after replay start at which each timestamp is due"""
+        return ((ts_arr - first_ts).astype(np.float64) / (1000.0 * speed)).tolist()
+
+    def _publish_range(self, topics: List[str], payloads: List[bytes], start: int,
+                       stop: int, index_base: int, total: Optional[int]) -> None:
+        """Publish messages [start, stop) back to back"""
+        for i in range(start, stop):
             try:
-                # Calculate timing
-                data_timestamp = data_point['ts'] / 1000.0
-                elapsed_data_time = data_timestamp - first_timestamp
-                target_elapsed_time = elapsed_data_time / speed
-                actual_elapsed_time = time.time() - start_time
-
-                # Wait if we're ahead of schedule
-                sleep_time = target_elapsed_time - actual_elapsed_time
-                if sleep_time > 0:
-                    time.sleep(sleep_time)
-
-                # Create MQTT topic
-                building = data_point.get('building', 'unknown')
-                device = data_point.get('device', 'unknown')
-                topic = f"{topic_prefix}/{building}/{device}/telemetry"
-
-                # Publish to MQTT
-                if self.mqtt_client and self.mqtt_client.is_connected():
-                    payload = json.dumps(data_point)
-                    self.mqtt_client.publish(topic, payload)
-
-                    if i % 100 == 0:  # Log progress every 100 points
-                        logger.info(
-                            f"Replayed {i+1}/{len(data_points)} points")
-                else:
-                    logger.warning("MQTT client not connected")
-
-            except KeyboardInterrupt:
-                logger.info("Received interrupt signal")
-                break
+                self._publish_message(topics[i], payloads[i], index_base + i, total)
             except Exception as e:
-                logger.error(f"Error replaying data point {i}: {e}")
+                logger.error(f"Error replaying data point {index_base + i}: {e}")
 
-        logger.info("Replay completed")
-        self.stop()
+    def _publish_message(self, topic: str, payload: bytes,
+                         index: int, total: Optional[int]) -> None:
+        """Publish a single pre-serialized message"""
+        if self.mqtt_client and self.mqtt_client.is_connected():
+            self.mqtt_client.publish(topic, payload, qos=0)
+
+            if index % PROGRESS_LOG_INTERVAL == 0:
+                logger.info("Replayed %d/%s points", index + 1,
+                            total if total is not None else '?')
+        else:
+            logger.warning("MQTT client not connected")
 
     def stop(self) -> None:
         """Stop the replay"""
@@ -244,6 +456,23 @@ class BDGReplay:
             self.mqtt_client.disconnect()
 
 
+async def run_replay_async(file_path: str, speed: float = 1.0, topic_prefix: str = "building",
+                           mqtt_broker: str = 'localhost', mqtt_port: int = 1883) -> int:
+    """Stream and replay a CSV file inside the running event loop
+
+    Returns the number of data points replayed. Blocking work (MQTT
+    connect, CSV parsing) runs in worker threads, and the CSV is read one
+    chunk at a time. The MQTT client is stopped however the replay ends,
+    including cancellation and parse errors.
+    """
+    replay = await asyncio.to_thread(BDGReplay, mqtt_broker, mqtt_port)
+    try:
+        messages = replay.iter_csv_messages(file_path, topic_prefix)
+        return await replay.replay_data_async(messages, speed)
+    finally:
+        await asyncio.to_thread(replay.stop)
+
+
 def signal_handler(signum, frame):
     """Handle shutdown signals"""
     logger.info("Received shutdown signal")
@@ -285,12 +514,9 @@ def main():
             output_dir = "replay/samples"
             replay.create_sample_csvs(source_dir, output_dir, args.sample_rows)
         else:
-            # Parse and replay data
-            data_points = replay.parse_csv_data(args.file)
-            if data_points:
-                replay.replay_data(data_points, args.speed, args.topic_prefix)
-            else:
-                logger.error("No data points found to replay")
+            # Stream and replay data (replay_data reports an empty file)
+            messages = replay.iter_csv_messages(args.file, args.topic_prefix)
+            replay.replay_data(messages, args.speed)
 
     except Exception as e:
         logger.error(f"Replay error: {e}")
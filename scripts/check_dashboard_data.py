@@ -1,44 +1,45 @@
 #!/usr/bin/env python3
 """Check all available data for dashboard panels"""
 
-from influxdb_client import InfluxDBClient
+from datetime import timedelta
+
+from common import INFLUXDB_BUCKET, get_query_api
+
+# Flux text is fixed; the values travel as query parameters
+TELEMETRY_QUERY = """
+from(bucket: _bucket)
+|> range(start: _start)
+|> filter(fn: (r) => r._measurement == _measurement)
+"""
 
 # Test InfluxDB connection
-client = InfluxDBClient(url='http://localhost:8086',
-                        token='telemetry-token-12345', org='telemetry')
-query_api = client.query_api()
+query_api = get_query_api()
 
 print('🔍 Checking all available data for dashboard panels...')
 print()
 
 # Check all data in the bucket
-query = """
-from(bucket: "building_data")
-|> range(start: -1h)
-|> filter(fn: (r) => r._measurement == "telemetry")
-"""
+params = {"_bucket": INFLUXDB_BUCKET, "_start": -timedelta(hours=1),
+          "_measurement": "telemetry"}
 
 try:
-    result = query_api.query(query=query)
-
-    # Collect all unique combinations
+    # Collect all unique combinations as records stream in
     data_points = {}
 
-    for table in result:
-        for record in table.records:
-            device = record.values.get('device', 'unknown')
-            point = record.values.get('point', 'unknown')
-            field = record.get_field()
-            value = record.get_value()
+    for record in query_api.query_stream(query=TELEMETRY_QUERY, params=params):
+        device = record.values.get('device', 'unknown')
+        point = record.values.get('point', 'unknown')
+        field = record.get_field()
+        value = record.get_value()
 
-            key = f"{device}.{point}.{field}"
-            if key not in data_points:
-                data_points[key] = []
-            data_points[key].append(value)
+        key = f"{device}.{point}.{field}"
+        if key not in data_points:
+            data_points[key] = set()
+        data_points[key].add(str(value))
 
     print(f'📊 Found {len(data_points)} unique data points:')
     for key, values in sorted(data_points.items()):
-        unique_values = list(set(str(v) for v in values))
+        unique_values = list(values)
         print(f'  {key}: {unique_values}')
 
     print()
@@ -67,5 +68,3 @@ try:
 
 except Exception as e:
     print(f'❌ Query failed: {e}')
-
-client.close()
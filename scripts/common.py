@@ -0,0 +1,151 @@
+#!/usr/bin/env python3
+"""
+Shared InfluxDB settings for the maintenance scripts
+
+The schema fix/reset scripts all talk to the same InfluxDB instance; they get
+their connection settings and a single gzip-enabled client from here.
+"""
+
+import atexit
+import time
+from datetime import timedelta
+from functools import lru_cache
+import pandas as pd
+from influxdb_client import InfluxDBClient
+from influxdb_client.client.write_api import WriteOptions
+
+# InfluxDB Configuration (matching docker-compose.yml and collector)
+INFLUXDB_URL = "http://localhost:8086"
+# From docker-compose.yml DOCKER_INFLUXDB_INIT_ADMIN_TOKEN
+INFLUXDB_TOKEN = "telemetry-token-12345"
+# From docker-compose.yml DOCKER_INFLUXDB_INIT_ORG
+INFLUXDB_ORG = "telemetry"
+# From docker-compose.yml DOCKER_INFLUXDB_INIT_BUCKET
+INFLUXDB_BUCKET = "building_data"
+
+# Batched writes: points are buffered and sent in as few POSTs as possible;
+# closing the writer (or leaving its with-block) flushes the buffer
+BATCH_WRITE_OPTIONS = WriteOptions(batch_size=5_000, flush_interval=1_000,
+                                   jitter_interval=0)
+
+_client = None
+
+
+def get_client() -> InfluxDBClient:
+    """Return the process-wide InfluxDB client, creating it on first use"""
+    global _client
+    if _client is None:
+        _client = InfluxDBClient(url=INFLUXDB_URL, token=INFLUXDB_TOKEN,
+                                 org=INFLUXDB_ORG, enable_gzip=True)
+    return _client
+
+
+@lru_cache(maxsize=None)
+def get_query_api():
+    """Return the query API of the shared client"""
+    return get_client().query_api()
+
+
+@atexit.register
+def close_client() -> None:
+    """Close the shared client; the next get_client() opens a fresh one"""
+    global _client
+    if _client is not None:
+        _client.close()
+        _client = None
+        get_query_api.cache_clear()
+
+
+def write_batched(client, record) -> None:
+    """Send record through a batching writer and raise if any batch failed
+
+    The batching writer only reports failed batches to error_callback on its
+    own thread, so the first failure is kept and re-raised once leaving the
+    with-block has flushed the buffer.
+    """
+    errors = []
+
+    def on_error(conf, data, exception):
+        errors.append(exception)
+
+    with client.write_api(write_options=BATCH_WRITE_OPTIONS,
+                          error_callback=on_error) as write_api:
+        write_api.write(bucket=INFLUXDB_BUCKET, org=INFLUXDB_ORG, record=record)
+    if errors:
+        raise errors[0]
+
+
+def query_frame(query_api, query: str) -> pd.DataFrame:
+    """Run a Flux query into a single DataFrame, minus result/table columns"""
+    frames = query_api.query_data_frame(query=query)
+    if isinstance(frames, list):
+        # One frame per distinct table schema (e.g. float vs string _value)
+        frames = pd.concat(frames, ignore_index=True) if frames else pd.DataFrame()
+    return frames.drop(columns=['result', 'table'], errors='ignore')
+
+
+def count_flux(query: str) -> str:
+    """Append a server-side total count to a Flux query's table stream"""
+    return query + '''
+        |> count()
+        |> keep(columns: ["_value"])
+        |> group()
+        |> sum()
+        '''
+
+
+def record_count(query_api, query: str) -> int:
+    """Count the records a Flux query matches without streaming them back"""
+    for record in query_api.query_stream(query=count_flux(query)):
+        return int(record.get_value())
+    return 0
+
+
+def telemetry_bounds_flux(measurement: str = "telemetry") -> str:
+    """Flux yielding per-series first/last point times as "first" and "last"
+
+    first()/last() run per series and are pushed down to storage, so this only
+    reads one point per series at each end. The script can be appended to
+    another query so the bounds come back in the same response.
+    """
+    return "".join(f'''
+        from(bucket: "{INFLUXDB_BUCKET}")
+        |> range(start: 0)
+        |> filter(fn: (r) => r._measurement == "{measurement}")
+        |> {selector}()
+        |> keep(columns: ["_time"])
+        |> yield(name: "{selector}")
+        ''' for selector in ("first", "last"))
+
+
+def time_bounds(records):
+    """Return (earliest, latest) from telemetry_bounds_flux() records, or None"""
+    times = {"first": [], "last": []}
+    for record in records:
+        if record.values.get("result") in times:
+            times[record.values["result"]].append(record.get_time())
+    if not times["first"] or not times["last"]:
+        return None
+
+    # Pad the stop so the newest point falls inside the delete window
+    return min(times["first"]), max(times["last"]) + timedelta(seconds=1)
+
+
+def telemetry_time_bounds(query_api, measurement: str = "telemetry"):
+    """Return (earliest, latest) point times for a measurement, or None if empty"""
+    return time_bounds(
+        query_api.query_stream(query=telemetry_bounds_flux(measurement)))
+
+
+def wait_until(condition, timeout: float, interval: float = 0.1) -> bool:
+    """Poll condition() until it returns true or timeout seconds pass"""
+    deadline = time.monotonic() + timeout
+    while True:
+        try:
+            if condition():
+                return True
+        except Exception:
+            pass  # Server not reachable yet; keep polling
+        if time.monotonic() >= deadline:
+            return False
+        time.sleep(interval)
@@ -12,7 +12,25 @@ This script generates a comprehensive status report showing:
 
 import requests
 import json
-from influxdb_client import InfluxDBClient
+from datetime import timedelta
+from requests.adapters import HTTPAdapter
+
+from common import INFLUXDB_BUCKET, get_query_api
+
+# Flux text is fixed; the values travel as query parameters
+TELEMETRY_QUERY = '''
+from(bucket: _bucket)
+|> range(start: _start)
+|> filter(fn: (r) => r._measurement == _measurement)
+'''
+
+RECENT_VALUES_QUERY = '''
+from(bucket: _bucket)
+|> range(start: _start)
+|> filter(fn: (r) => r._measurement == _measurement)
+|> filter(fn: (r) => r._field == "value")
+|> limit(n: _limit)
+'''
 
 
 def generate_final_report():
@@ -21,33 +39,29 @@ def generate_final_report():
     print("🎯 TELEMETRY PIPELINE - FINAL STATUS REPORT")
     print("=" * 60)
 
+    # One InfluxDB client and one keep-alive HTTP session for every check
+    query_api = get_query_api()
+    session = requests.Session()
+    session.mount('http://', HTTPAdapter(pool_connections=4, pool_maxsize=4))
+
     # Check core services
     print("\\n📋 CORE SERVICES STATUS:")
 
     # InfluxDB data check
     try:
-        client = InfluxDBClient(
-            url='http://localhost:8086', token='telemetry-token-12345', org='telemetry')
-        query_api = client.query_api()
-
-        query = '''
-        from(bucket: "building_data")
-        |> range(start: -1h)
-        |> filter(fn: (r) => r._measurement == "telemetry")
-        '''
-
-        result = query_api.query(query=query)
-        record_count = sum(len(table.records) for table in result)
+        params = {"_bucket": INFLUXDB_BUCKET, "_start": -timedelta(hours=1),
+                  "_measurement": "telemetry"}
+        record_count = sum(1 for _ in query_api.query_stream(
+            query=TELEMETRY_QUERY, params=params))
 
         print(f"  ✅ InfluxDB: Connected ({record_count} telemetry records)")
-        client.close()
 
     except Exception as e:
         print(f"  ❌ InfluxDB: Error - {e}")
 
     # API Health check
     try:
-        response = requests.get('http://localhost:8000/health', timeout=5)
+        response = session.get('http://localhost:8000/health', timeout=5)
         if response.status_code == 200:
             health_data = response.json()
             print(
@@ -59,7 +73,7 @@ def generate_final_report():
 
     # Grafana check
     try:
-        response = requests.get('http://localhost:3000', timeout=5)
+        response = session.get('http://localhost:3000', timeout=5)
         if response.status_code == 200:
             print("  ✅ Grafana: Running")
         else:
@@ -70,38 +84,27 @@ def generate_final_report():
     # Check recent telemetry data
     print("\\n📊 RECENT TELEMETRY DATA:")
     try:
-        client = InfluxDBClient(
-            url='http://localhost:8086', token='telemetry-token-12345', org='telemetry')
-        query_api = client.query_api()
-
-        query = '''
-        from(bucket: "building_data")
-        |> range(start: -10m)
-        |> filter(fn: (r) => r._measurement == "telemetry")
-        |> filter(fn: (r) => r._field == "value")
-        |> limit(n: 5)
-        '''
-
-        result = query_api.query(query=query)
+        params = {"_bucket": INFLUXDB_BUCKET, "_start": -timedelta(minutes=10),
+                  "_measurement": "telemetry", "_limit": 5}
         recent_count = 0
-        for table in result:
-            for record in table.records:
-                recent_count += 1
-                point = record.values.get("point", "unknown")
-                value = record.get_value()
-                device = record.values.get("device", "unknown")
-                print(f"  📈 {device}/{point}: {value}")
+        for record in query_api.query_stream(query=RECENT_VALUES_QUERY,
+                                             params=params):
+            recent_count += 1
+            point = record.values.get("point", "unknown")
+            value = record.get_value()
+            device = record.values.get("device", "unknown")
+            print(f"  📈 {device}/{point}: {value}")
 
         if recent_count > 0:
             print(f"  ✅ Recent Data: {recent_count} points in last 10 minutes")
         else:
             print("  ⚠️  Recent Data: No data in last 10 minutes")
 
-        client.close()
-
     except Exception as e:
         print(f"  ❌ Recent Data: Error - {e}")
 
+    session.close()
+
     # Access URLs
     print("\\n🌐 ACCESS URLS:")
     print("  📊 Grafana Dashboard: http://localhost:3000")
@@ -1,32 +1,40 @@
 #!/usr/bin/env python3
 """Fix dashboard data source UIDs"""
 
-import json
+from collections import deque
+
+import orjson
 
 # Read the dashboard
-with open('grafana/dashboards/building-telemetry.json', 'r') as f:
-    dashboard = json.load(f)
+with open('grafana/dashboards/building-telemetry.json', 'rb') as f:
+    dashboard = orjson.loads(f.read())
 
 # Update all data source UIDs from "influxdb" to the correct UID
 
 
 def update_datasource_uid(obj):
-    if isinstance(obj, dict):
-        for key, value in obj.items():
-            if key == 'datasource' and isinstance(value, dict) and value.get('uid') == 'influxdb':
-                value['uid'] = 'P951FEA4DE68E13C5'
-                print(f'✅ Updated datasource UID')
-            else:
-                update_datasource_uid(value)
-    elif isinstance(obj, list):
-        for item in obj:
-            update_datasource_uid(item)
+    # Explicit stack instead of recursion so deeply nested dashboards
+    # can't hit the recursion limit; only containers are pushed, and
+    # datasource refs are leaves so they are never descended into
+    stack = deque([obj])
+    while stack:
+        node = stack.pop()
+        if isinstance(node, dict):
+            for key, value in node.items():
+                if key == 'datasource' and isinstance(value, dict):
+                    if value.get('uid') == 'influxdb':
+                        value['uid'] = 'P951FEA4DE68E13C5'
+                        print(f'✅ Updated datasource UID')
+                elif isinstance(value, (dict, list)):
+                    stack.append(value)
+        elif isinstance(node, list):
+            stack.extend(item for item in node if isinstance(item, (dict, list)))
 
 
 update_datasource_uid(dashboard)
 
 # Write back the fixed dashboard
-with open('grafana/dashboards/building-telemetry.json', 'w') as f:
-    json.dump(dashboard, f, indent=2)
+with open('grafana/dashboards/building-telemetry.json', 'wb') as f:
+    f.write(orjson.dumps(dashboard, option=orjson.OPT_INDENT_2))
 
 print('🔧 Dashboard updated with correct data source UID: P951FEA4DE68E13C5')
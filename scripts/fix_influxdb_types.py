@@ -13,22 +13,13 @@ Error being fixed:
 
 import logging
 import sys
-import os
-from influxdb_client import InfluxDBClient, Point, WritePrecision
-from influxdb_client.client.write_api import SYNCHRONOUS
+from influxdb_client import WritePrecision
 from influxdb_client.client.exceptions import InfluxDBError
 
-# Add the src directory to the path
-sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'src'))
-
-# InfluxDB Configuration (matching docker-compose.yml and collector)
-INFLUXDB_URL = "http://localhost:8086"
-# From docker-compose.yml DOCKER_INFLUXDB_INIT_ADMIN_TOKEN
-INFLUXDB_TOKEN = "telemetry-token-12345"
-# From docker-compose.yml DOCKER_INFLUXDB_INIT_ORG
-INFLUXDB_ORG = "telemetry"
-# From docker-compose.yml DOCKER_INFLUXDB_INIT_BUCKET
-INFLUXDB_BUCKET = "building_data"
+from common import (INFLUXDB_BUCKET, INFLUXDB_ORG,
+                    count_flux, get_client, record_count,
+                    telemetry_bounds_flux, time_bounds, wait_until,
+                    write_batched)
 
 logging.basicConfig(level=logging.INFO,
                     format='%(asctime)s - %(levelname)s - %(message)s')
@@ -40,8 +31,7 @@ def fix_influxdb_schema():
 
     try:
         # Connect to InfluxDB
-        client = InfluxDBClient(
-            url=INFLUXDB_URL, token=INFLUXDB_TOKEN, org=INFLUXDB_ORG)
+        client = get_client()
 
         # Test connection
         health = client.health()
@@ -55,39 +45,55 @@ def fix_influxdb_schema():
         query_api = client.query_api()
         delete_api = client.delete_api()
 
-        # Check current data in the problematic measurement
-        query = f'''
+        # Check current data in the problematic measurement; the server counts
+        # it, and the time bounds for the delete ride along in the same response
+        existing_query = f'''
         from(bucket: "{INFLUXDB_BUCKET}")
         |> range(start: -24h)
         |> filter(fn: (r) => r._measurement == "telemetry")
-        |> limit(n: 5)
         '''
+        query = (count_flux(existing_query) + '|> yield(name: "existing")'
+                 + telemetry_bounds_flux())
 
         logger.info("🔍 Checking existing telemetry data...")
 
         try:
-            result = query_api.query(query=query)
-            record_count = 0
-            for table in result:
-                for record in table.records:
-                    record_count += 1
-                    logger.info(
-                        f"Found record: {record.get_measurement()}, field: {record.get_field()}, value: {record.get_value()} (type: {type(record.get_value()).__name__})")
-
-            if record_count > 0:
+            existing_count = 0
+            bound_records = []
+            for record in query_api.query_stream(query=query):
+                if record.values.get("result") == "existing":
+                    existing_count = int(record.get_value())
+                else:
+                    bound_records.append(record)
+
+            if existing_count > 0 and logger.isEnabledFor(logging.DEBUG):
+                sample_query = existing_query + '''
+                |> limit(n: 5)
+                |> keep(columns: ["_measurement", "_value", "_field"])
+                '''
+                for record in query_api.query_stream(query=sample_query):
+                    value = record.get_value()
+                    logger.debug("Found record: %s, field: %s, value: %s (type: %s)",
+                                 record.get_measurement(), record.get_field(),
+                                 value, type(value).__name__)
+
+            if existing_count > 0:
                 logger.warning(
-                    f"Found {record_count} existing records with potential type conflicts")
+                    f"Found {existing_count} existing records with potential type conflicts")
 
-                # Delete all telemetry measurement data
+                # Delete all telemetry measurement data, limited to the
+                # window that actually holds points
                 logger.info(
                     "🗑️  Deleting existing telemetry measurement data...")
-                delete_api.delete(
-                    start="1970-01-01T00:00:00Z",
-                    stop="2025-12-31T23:59:59Z",
-                    predicate='_measurement="telemetry"',
-                    bucket=INFLUXDB_BUCKET,
-                    org=INFLUXDB_ORG
-                )
+                bounds = time_bounds(bound_records)
+                if bounds:
+                    delete_api.delete(
+                        start=bounds[0],
+                        stop=bounds[1],
+                        predicate='_measurement="telemetry"',
+                        bucket=INFLUXDB_BUCKET,
+                        org=INFLUXDB_ORG
+                    )
                 logger.info("✅ Deleted existing telemetry data")
             else:
                 logger.info("No existing telemetry data found")
@@ -97,33 +103,20 @@ def fix_influxdb_schema():
                 f"Could not query existing data (this is normal for fresh setup): {e}")
 
         # Write test data with correct types
-        write_api = client.write_api(write_options=SYNCHRONOUS)
-
         logger.info("✏️  Writing test data with correct float types...")
 
-        # Create test points with explicit float values
-        test_points = [
-            Point("telemetry")
-            .tag("device_id", "TEST_AHU_01")
-            .tag("device_type", "AHU")
-            .tag("location", "Building_A")
-            .field("temperature", 22.5)  # Explicit float
-            .field("humidity", 45.0)     # Explicit float
-            .field("pressure", 1013.25)  # Explicit float
-            .field("value", 22.5),       # The problematic field as float
-
-            Point("telemetry")
-            .tag("device_id", "TEST_AHU_02")
-            .tag("device_type", "AHU")
-            .tag("location", "Building_B")
-            .field("temperature", 23.1)  # Explicit float
-            .field("humidity", 48.0)     # Explicit float
-            .field("pressure", 1012.8)   # Explicit float
-            .field("value", 23.1)        # The problematic field as float
-        ]
-
-        write_api.write(bucket=INFLUXDB_BUCKET,
-                        org=INFLUXDB_ORG, record=test_points)
+        # Test points as line protocol (tags sorted) with explicit float
+        # fields, including the problematic "value" field
+        test_points = "\n".join([
+            "telemetry,device_id=TEST_AHU_01,device_type=AHU,location=Building_A "
+            "temperature=22.5,humidity=45.0,pressure=1013.25,value=22.5",
+            "telemetry,device_id=TEST_AHU_02,device_type=AHU,location=Building_B "
+            "temperature=23.1,humidity=48.0,pressure=1012.8,value=23.1",
+        ])
+
+        # One batched POST; a rejected batch (e.g. a field type conflict)
+        # raises InfluxDBError here
+        write_batched(client, test_points)
         logger.info("✅ Successfully wrote test data with correct float types")
 
         # Verify the fix
@@ -133,17 +126,18 @@ def fix_influxdb_schema():
         |> range(start: -1h)
         |> filter(fn: (r) => r._measurement == "telemetry")
         |> filter(fn: (r) => r._field == "value")
-        |> limit(n: 3)
         '''
 
-        result = query_api.query(query=verify_query)
-        verification_count = 0
-        for table in result:
-            for record in table.records:
-                verification_count += 1
+        verification_count = record_count(query_api, verify_query)
+        if verification_count > 0 and logger.isEnabledFor(logging.DEBUG):
+            sample_query = verify_query + '''
+            |> limit(n: 3)
+            |> keep(columns: ["_value", "_field"])
+            '''
+            for record in query_api.query_stream(query=sample_query):
                 value = record.get_value()
-                logger.info(
-                    f"✅ Verified record: field={record.get_field()}, value={value} (type: {type(value).__name__})")
+                logger.debug("Verified record: field=%s, value=%s (type: %s)",
+                             record.get_field(), value, type(value).__name__)
 
         if verification_count > 0:
             logger.info(
@@ -160,9 +154,6 @@ def fix_influxdb_schema():
     except Exception as e:
         logger.error(f"❌ Unexpected error: {e}")
         return False
-    finally:
-        if 'client' in locals():
-            client.close()
 
 
 def main():
@@ -172,9 +163,8 @@ def main():
     logger.info("=" * 50)
 
     # Wait for InfluxDB to be ready
-    import time
     logger.info("⏳ Waiting for InfluxDB to be ready...")
-    time.sleep(5)
+    wait_until(get_client().ping, timeout=5)
 
     success = fix_influxdb_schema()
 
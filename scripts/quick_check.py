@@ -1,29 +1,36 @@
 #!/usr/bin/env python3
 """Quick InfluxDB data check"""
 
-from influxdb_client import InfluxDBClient
+from concurrent.futures import ThreadPoolExecutor
 
-client = InfluxDBClient(url='http://localhost:8086',
-                        token='telemetry-token-12345', org='telemetry')
-query_api = client.query_api()
+from common import get_query_api, query_frame, record_count
+
+query_api = get_query_api()
 
 query = '''
 from(bucket: "building_data")
 |> range(start: -1h)
 |> filter(fn: (r) => r._measurement == "telemetry")
+'''
+
+sample_query = query + '''
 |> limit(n: 10)
+|> keep(columns: ["_time", "_value", "_field", "point"])
 '''
 
 try:
-    result = query_api.query(query=query)
-    count = 0
-    for table in result:
-        for record in table.records:
-            count += 1
-            point = record.values.get("point", "unknown")
-            value = record.get_value()
-            field = record.get_field()
-            print(f'✅ {point}: {value} ({field})')
+    # The server counts every record; only a handful of samples come back.
+    # Both queries are independent, so they run side by side
+    with ThreadPoolExecutor(max_workers=2) as executor:
+        count_future = executor.submit(record_count, query_api, query)
+        sample_future = executor.submit(query_frame, query_api, sample_query)
+        count = count_future.result()
+        df = sample_future.result()
+
+    if not df.empty:
+        # Series without a point tag have no 'point' column at all
+        print(df.reindex(columns=['point', '_value', '_field'])
+              .fillna({'point': 'unknown'}).to_string(index=False))
 
     print(f'\n📊 Total records found: {count}')
 
@@ -34,6 +41,3 @@ try:
 
 except Exception as e:
     print(f"❌ Error: {e}")
-
-finally:
-    client.close()
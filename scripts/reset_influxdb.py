@@ -14,15 +14,13 @@ This is a more aggressive fix than the previous script.
 import logging
 import sys
 import time
-from influxdb_client import InfluxDBClient, Point, WritePrecision
-from influxdb_client.client.write_api import SYNCHRONOUS
+from influxdb_client import WritePrecision
 from influxdb_client.client.exceptions import InfluxDBError
+from influxdb_client.domain.bucket import Bucket
+from influxdb_client.domain.bucket_retention_rules import BucketRetentionRules
 
-# InfluxDB Configuration
-INFLUXDB_URL = "http://localhost:8086"
-INFLUXDB_TOKEN = "telemetry-token-12345"
-INFLUXDB_ORG = "telemetry"
-INFLUXDB_BUCKET = "building_data"
+from common import (INFLUXDB_BUCKET, INFLUXDB_ORG,
+                    get_client, record_count, wait_until, write_batched)
 
 logging.basicConfig(level=logging.INFO,
                     format='%(asctime)s - %(levelname)s - %(message)s')
@@ -34,8 +32,7 @@ def reset_influxdb_schema():
 
     try:
         # Connect to InfluxDB
-        client = InfluxDBClient(
-            url=INFLUXDB_URL, token=INFLUXDB_TOKEN, org=INFLUXDB_ORG)
+        client = get_client()
 
         # Test connection
         health = client.health()
@@ -50,13 +47,7 @@ def reset_influxdb_schema():
 
         # Find the existing bucket
         logger.info(f"🔍 Looking for bucket: {INFLUXDB_BUCKET}")
-        buckets = buckets_api.find_buckets()
-
-        target_bucket = None
-        for bucket in buckets.buckets:
-            if bucket.name == INFLUXDB_BUCKET:
-                target_bucket = bucket
-                break
+        target_bucket = buckets_api.find_bucket_by_name(INFLUXDB_BUCKET)
 
         if target_bucket:
             logger.info(
@@ -67,8 +58,9 @@ def reset_influxdb_schema():
             buckets_api.delete_bucket(target_bucket.id)
             logger.info(f"✅ Bucket deleted successfully")
 
-            # Wait a moment for deletion to complete
-            time.sleep(2)
+            # Wait for deletion to complete
+            wait_until(lambda: buckets_api.find_bucket_by_name(
+                INFLUXDB_BUCKET) is None, timeout=2)
         else:
             logger.info(
                 f"📦 Bucket {INFLUXDB_BUCKET} not found, will create new one")
@@ -78,22 +70,15 @@ def reset_influxdb_schema():
 
         # Get organization
         orgs_api = client.organizations_api()
-        orgs = orgs_api.find_organizations()
-        target_org = None
-
-        for org in orgs.orgs:
-            if org.name == INFLUXDB_ORG:
-                target_org = org
-                break
+        # Filter by name on the server instead of listing every org
+        target_org = next(
+            iter(orgs_api.find_organizations(org=INFLUXDB_ORG)), None)
 
         if not target_org:
             logger.error(f"❌ Organization '{INFLUXDB_ORG}' not found")
             return False
 
         # Create new bucket with 30 day retention
-        from influxdb_client.domain.bucket import Bucket
-        from influxdb_client.domain.bucket_retention_rules import BucketRetentionRules
-
         retention_rules = BucketRetentionRules(
             type="expire", every_seconds=30*24*60*60)  # 30 days
 
@@ -108,13 +93,8 @@ def reset_influxdb_schema():
             f"✅ Created new bucket: {created_bucket.name} (ID: {created_bucket.id})")
 
         # Write test data with consistent types
-        write_api = client.write_api(write_options=SYNCHRONOUS)
-
         logger.info("✏️  Writing test data with consistent float types...")
 
-        # Create test points that mirror the AHU simulator structure
-        test_points = []
-
         # Simulate AHU telemetry data
         ahu_points = {
             "outside_temp": 22.5,
@@ -124,33 +104,19 @@ def reset_influxdb_schema():
             "economizer_position": 45.0
         }
 
-        for point_name, value in ahu_points.items():
-            point = Point("telemetry") \
-                .tag("building", "demo_building") \
-                .tag("device", "ahu1") \
-                .tag("point", point_name) \
-                .field("value", float(value))  # Ensure all values are floats
-            test_points.append(point)
+        # Test points that mirror the AHU simulator structure, as line
+        # protocol with tags in sorted order
+        series = "telemetry,building=demo_building,device=ahu1,point="
+        test_points = [f"{series}{point_name} value={float(value)!r}"  # Ensure all values are floats
+                       for point_name, value in ahu_points.items()]
 
         # Also add string/boolean fields separately to test mixed types
-        test_points.append(
-            Point("telemetry")
-            .tag("building", "demo_building")
-            .tag("device", "ahu1")
-            .tag("point", "fan_status")
-            .field("status", "ON")  # String field with different name
-        )
-
-        test_points.append(
-            Point("telemetry")
-            .tag("building", "demo_building")
-            .tag("device", "ahu1")
-            .tag("point", "alarm")
-            .field("active", False)  # Boolean field with different name
-        )
+        test_points.append(f'{series}fan_status status="ON"')  # String field with different name
+        test_points.append(f"{series}alarm active=false")  # Boolean field with different name
 
-        write_api.write(bucket=INFLUXDB_BUCKET,
-                        org=INFLUXDB_ORG, record=test_points)
+        # One batched POST; a rejected batch (e.g. a field type conflict)
+        # raises InfluxDBError here
+        write_batched(client, "\n".join(test_points))
         logger.info("✅ Successfully wrote test data with clean schema")
 
         # Verify the schema reset
@@ -161,18 +127,15 @@ def reset_influxdb_schema():
         from(bucket: "{INFLUXDB_BUCKET}")
         |> range(start: -1h)
         |> filter(fn: (r) => r._measurement == "telemetry")
-        |> limit(n: 10)
         '''
 
-        result = query_api.query(query=verify_query)
-        verification_count = 0
-        for table in result:
-            for record in table.records:
-                verification_count += 1
+        verification_count = record_count(query_api, verify_query)
+        if verification_count > 0 and logger.isEnabledFor(logging.DEBUG):
+            sample_query = verify_query + "|> limit(n: 10)"
+            for record in query_api.query_stream(query=sample_query):
                 value = record.get_value()
-                field = record.get_field()
-                logger.info(
-                    f"✅ Verified record: field={field}, value={value} (type: {type(value).__name__})")
+                logger.debug("Verified record: field=%s, value=%s (type: %s)",
+                             record.get_field(), value, type(value).__name__)
 
         if verification_count > 0:
             logger.info(
@@ -189,9 +152,6 @@ def reset_influxdb_schema():
     except Exception as e:
         logger.error(f"❌ Unexpected error: {e}")
         return False
-    finally:
-        if 'client' in locals():
-            client.close()
 
 
 def main():
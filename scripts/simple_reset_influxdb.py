@@ -8,15 +8,12 @@ This script uses the delete API to clear all telemetry data and recreate clean s
 import logging
 import sys
 import time
-from influxdb_client import InfluxDBClient, Point, WritePrecision
+from influxdb_client import WritePrecision
 from influxdb_client.client.write_api import SYNCHRONOUS
 from influxdb_client.client.exceptions import InfluxDBError
 
-# InfluxDB Configuration
-INFLUXDB_URL = "http://localhost:8086"
-INFLUXDB_TOKEN = "telemetry-token-12345"
-INFLUXDB_ORG = "telemetry"
-INFLUXDB_BUCKET = "building_data"
+from common import (INFLUXDB_BUCKET, INFLUXDB_ORG, get_client, record_count,
+                    telemetry_time_bounds, wait_until)
 
 logging.basicConfig(level=logging.INFO,
                     format='%(asctime)s - %(levelname)s - %(message)s')
@@ -28,8 +25,7 @@ def clear_telemetry_data():
 
     try:
         # Connect to InfluxDB
-        client = InfluxDBClient(
-            url=INFLUXDB_URL, token=INFLUXDB_TOKEN, org=INFLUXDB_ORG)
+        client = get_client()
 
         # Test connection
         health = client.health()
@@ -43,26 +39,29 @@ def clear_telemetry_data():
         delete_api = client.delete_api()
 
         logger.info("🗑️ Deleting all telemetry measurement data...")
-        delete_api.delete(
-            start="1970-01-01T00:00:00Z",
-            stop="2025-12-31T23:59:59Z",
-            predicate='_measurement="telemetry"',
-            bucket=INFLUXDB_BUCKET,
-            org=INFLUXDB_ORG
-        )
-        logger.info("✅ All telemetry data deleted")
-
-        # Wait for deletion to complete
-        time.sleep(3)
+        # Only touch the window that actually holds telemetry points
+        bounds = telemetry_time_bounds(client.query_api())
+        if bounds:
+            delete_api.delete(
+                start=bounds[0],
+                stop=bounds[1],
+                predicate='_measurement="telemetry"',
+                bucket=INFLUXDB_BUCKET,
+                org=INFLUXDB_ORG
+            )
+            logger.info("✅ All telemetry data deleted")
+
+            # Wait for deletion to complete
+            wait_until(lambda: telemetry_time_bounds(
+                client.query_api()) is None, timeout=3)
+        else:
+            logger.info("No existing telemetry data found")
 
         # Write clean test data with consistent types
         write_api = client.write_api(write_options=SYNCHRONOUS)
 
         logger.info("✏️ Writing test data with consistent types...")
 
-        # Create test points that mirror AHU simulator structure
-        test_points = []
-
         # Numeric telemetry fields (all as floats)
         numeric_fields = {
             "outside_temp": 22.5,
@@ -72,37 +71,25 @@ def clear_telemetry_data():
             "economizer_position": 45.0
         }
 
-        timestamp = time.time_ns() // 1_000_000  # milliseconds
+        timestamp = int(time.time())  # seconds; test data has no sub-second meaning
 
-        for point_name, value in numeric_fields.items():
-            point = Point("telemetry") \
-                .tag("building", "demo_building") \
-                .tag("device", "ahu1") \
-                .tag("point", point_name) \
-                .field("value", float(value)) \
-                .time(timestamp, WritePrecision.MS)
-            test_points.append(point)
+        # Test points that mirror the collector's schema (one series per
+        # point tag), as line protocol sharing a single tag prefix
+        series = "telemetry,building=demo_building,device=ahu1,point="
+        test_points = [f"{series}{point_name} value={float(value)!r} {timestamp}"
+                       for point_name, value in numeric_fields.items()]
 
         # String fields with different field names to avoid conflicts
-        point = Point("telemetry") \
-            .tag("building", "demo_building") \
-            .tag("device", "ahu1") \
-            .tag("point", "fan_status") \
-            .field("text_value", "ON") \
-            .time(timestamp, WritePrecision.MS)
-        test_points.append(point)
+        test_points.append(
+            f'{series}fan_status text_value="ON" {timestamp}')
 
         # Boolean fields
-        point = Point("telemetry") \
-            .tag("building", "demo_building") \
-            .tag("device", "ahu1") \
-            .tag("point", "alarm") \
-            .field("bool_value", False) \
-            .time(timestamp, WritePrecision.MS)
-        test_points.append(point)
-
-        write_api.write(bucket=INFLUXDB_BUCKET,
-                        org=INFLUXDB_ORG, record=test_points)
+        test_points.append(
+            f"{series}alarm bool_value=false {timestamp}")
+
+        write_api.write(bucket=INFLUXDB_BUCKET, org=INFLUXDB_ORG,
+                        record="\n".join(test_points),
+                        write_precision=WritePrecision.S)
         logger.info("✅ Successfully wrote test data with clean schema")
 
         # Verify the fix
@@ -113,20 +100,16 @@ def clear_telemetry_data():
         from(bucket: "{INFLUXDB_BUCKET}")
         |> range(start: -1h)
         |> filter(fn: (r) => r._measurement == "telemetry")
-        |> limit(n: 10)
         '''
 
-        result = query_api.query(query=verify_query)
-        verification_count = 0
-
-        for table in result:
-            for record in table.records:
-                verification_count += 1
+        verification_count = record_count(query_api, verify_query)
+        if verification_count > 0 and logger.isEnabledFor(logging.DEBUG):
+            sample_query = verify_query + "|> limit(n: 10)"
+            for record in query_api.query_stream(query=sample_query):
                 value = record.get_value()
-                field = record.get_field()
-                point = record.values.get("point", "unknown")
-                logger.info(
-                    f"✅ Verified: point={point}, field={field}, value={value} (type: {type(value).__name__})")
+                logger.debug("Verified: point=%s, field=%s, value=%s (type: %s)",
+                             record.values.get("point", "unknown"),
+                             record.get_field(), value, type(value).__name__)
 
         if verification_count > 0:
             logger.info(
@@ -143,9 +126,6 @@ def clear_telemetry_data():
     except Exception as e:
         logger.error(f"❌ Unexpected error: {e}")
         return False
-    finally:
-        if 'client' in locals():
-            client.close()
 
 
 def main():
@@ -3,19 +3,16 @@
 
 import json
 import requests
-import base64
 
-# Test Grafana API
-headers = {
-    'Authorization': f'Basic {base64.b64encode(b"admin:admin").decode("ascii")}'
-}
+# Test Grafana API over one keep-alive session
+session = requests.Session()
+session.auth = ('admin', 'admin')
 
 print('🔍 Testing Grafana after UID fix...')
 
 # Test data source
 try:
-    response = requests.get(
-        'http://localhost:3000/api/datasources/1', headers=headers)
+    response = session.get('http://localhost:3000/api/datasources/1')
     if response.status_code == 200:
         ds = response.json()
         print(f'✅ Data source accessible: {ds["name"]} (UID: {ds["uid"]})')
@@ -26,8 +23,8 @@ except Exception as e:
 
 # Test dashboard
 try:
-    response = requests.get(
-        'http://localhost:3000/api/dashboards/uid/building-telemetry', headers=headers)
+    response = session.get(
+        'http://localhost:3000/api/dashboards/uid/building-telemetry')
     if response.status_code == 200:
         dashboard = response.json()
         print(f'✅ Dashboard accessible: {dashboard["meta"]["slug"]}')
@@ -48,6 +45,8 @@ try:
 except Exception as e:
     print(f'❌ Dashboard request failed: {e}')
 
+session.close()
+
 print()
 print('📋 Next steps:')
 print('1. Open http://localhost:3000/d/building-telemetry/building-telemetry-dashboard')
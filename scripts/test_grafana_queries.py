@@ -1,12 +1,10 @@
 #!/usr/bin/env python3
 """Test Grafana InfluxDB queries"""
 
-from influxdb_client import InfluxDBClient
+from common import get_query_api, query_frame
 
 # Test InfluxDB connection with exact same config as Grafana
-client = InfluxDBClient(url='http://localhost:8086',
-                        token='telemetry-token-12345', org='telemetry')
-query_api = client.query_api()
+query_api = get_query_api()
 
 print('🔍 Testing InfluxDB queries that Grafana should use...')
 print()
@@ -20,18 +18,16 @@ from(bucket: "building_data")
 |> filter(fn: (r) => r.point == "supply_temp" or r.point == "outside_temp" or r.point == "setpoint")
 |> filter(fn: (r) => r.device == "ahu1")
 |> limit(n: 5)
+|> keep(columns: ["_time", "_value", "point"])
 """
 
 try:
-    result = query_api.query(query=query)
-    count = 0
-    for table in result:
-        for record in table.records:
-            count += 1
-            point = record.values.get('point', 'unknown')
-            value = record.get_value()
-            time = record.get_time()
-            print(f'✅ Found: {point} = {value} at {time}')
+    df = query_frame(query_api, query)
+    count = len(df)
+    if count > 0:
+        # Series without a point tag have no 'point' column at all
+        print(df.reindex(columns=['point', '_value', '_time'])
+              .fillna({'point': 'unknown'}).to_string(index=False))
 
     if count == 0:
         print('❌ No records found with temperature query')
@@ -43,23 +39,18 @@ try:
         |> range(start: -1h)
         |> filter(fn: (r) => r._measurement == "telemetry")
         |> limit(n: 10)
+        |> keep(columns: ["_measurement", "_value", "_field", "point", "device"])
         """
 
-        result2 = query_api.query(query=broad_query)
-        for table in result2:
-            for record in table.records:
-                measurement = record.values.get('_measurement', 'unknown')
-                field = record.get_field()
-                point = record.values.get('point', 'unknown')
-                device = record.values.get('device', 'unknown')
-                value = record.get_value()
-                print(
-                    f'📊 Record: measurement={measurement}, field={field}, point={point}, device={device}, value={value}')
+        df = query_frame(query_api, broad_query)
+        if not df.empty:
+            print(df.reindex(columns=['_measurement', '_field', 'point',
+                                      'device', '_value'])
+                  .fillna({'point': 'unknown', 'device': 'unknown'})
+                  .to_string(index=False))
     else:
         print(
             f'\n✅ Found {count} temperature records - Grafana should see this data!')
 
 except Exception as e:
     print(f'❌ Query failed: {e}')
-
-client.close()
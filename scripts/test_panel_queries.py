@@ -1,17 +1,15 @@
 #!/usr/bin/env python3
 """Test specific dashboard panel queries"""
 
-from influxdb_client import InfluxDBClient
+from concurrent.futures import ThreadPoolExecutor
 
-client = InfluxDBClient(url='http://localhost:8086',
-                        token='telemetry-token-12345', org='telemetry')
-query_api = client.query_api()
+from common import get_query_api, query_frame
+
+query_api = get_query_api()
 
 print('🔍 Testing specific dashboard panel queries...')
 print()
 
-# Test Fan Status query
-print('1️⃣ Testing Fan Status query:')
 fan_query = """
 from(bucket: "building_data")
 |> range(start: -1h)
@@ -20,17 +18,35 @@ from(bucket: "building_data")
 |> filter(fn: (r) => r.point == "fan_status")
 |> filter(fn: (r) => r.device == "ahu1")
 |> last()
+|> keep(columns: ["_time", "_value"])
+"""
+
+alarm_query = """
+from(bucket: "building_data")
+|> range(start: -1h)
+|> filter(fn: (r) => r._measurement == "telemetry")
+|> filter(fn: (r) => r._field == "bool_value")
+|> filter(fn: (r) => r.point == "alarm")
+|> filter(fn: (r) => r._value == true)
+|> sort(columns: ["_time"], desc: true)
+|> limit(n: 10)
+|> keep(columns: ["_time", "_value", "device"])
 """
 
+# The panel queries are independent; run them concurrently on the shared
+# client's connection pool
+executor = ThreadPoolExecutor(max_workers=2)
+fan_future = executor.submit(query_frame, query_api, fan_query)
+alarm_future = executor.submit(query_frame, query_api, alarm_query)
+
+# Test Fan Status query
+print('1️⃣ Testing Fan Status query:')
+
 try:
-    result = query_api.query(query=fan_query)
-    found = False
-    for table in result:
-        for record in table.records:
-            found = True
-            value = record.get_value()
-            time = record.get_time()
-            print(f'✅ Fan Status: {value} at {time}')
+    df = fan_future.result()
+    found = not df.empty
+    if found:
+        print(df[['_value', '_time']].to_string(index=False))
 
     if not found:
         print('❌ No fan status data found')
@@ -41,27 +57,12 @@ print()
 
 # Test Active Alarms query
 print('2️⃣ Testing Active Alarms query:')
-alarm_query = """
-from(bucket: "building_data")
-|> range(start: -1h)
-|> filter(fn: (r) => r._measurement == "telemetry")
-|> filter(fn: (r) => r._field == "bool_value")
-|> filter(fn: (r) => r.point == "alarm")
-|> filter(fn: (r) => r._value == true)
-|> sort(columns: ["_time"], desc: true)
-|> limit(n: 10)
-"""
 
 try:
-    result = query_api.query(query=alarm_query)
-    found = False
-    for table in result:
-        for record in table.records:
-            found = True
-            value = record.get_value()
-            time = record.get_time()
-            device = record.values.get('device', 'unknown')
-            print(f'✅ Active Alarm: {device} = {value} at {time}')
+    df = alarm_future.result()
+    found = not df.empty
+    if found:
+        print(df[['device', '_value', '_time']].to_string(index=False))
 
     if not found:
         print('❌ No active alarms found (this is expected since alarm value is False)')
@@ -74,15 +75,12 @@ try:
         |> filter(fn: (r) => r._measurement == "telemetry")
         |> filter(fn: (r) => r._field == "bool_value")
         |> filter(fn: (r) => r.point == "alarm")
+        |> keep(columns: ["_time", "_value", "device"])
         """
 
-        result2 = query_api.query(query=any_alarm_query)
-        for table in result2:
-            for record in table.records:
-                value = record.get_value()
-                time = record.get_time()
-                device = record.values.get('device', 'unknown')
-                print(f'   📊 Alarm data: {device} = {value} at {time}')
+        df = query_frame(query_api, any_alarm_query)
+        if not df.empty:
+            print(df[['device', '_value', '_time']].to_string(index=False))
 
 except Exception as e:
     print(f'❌ Alarm query failed: {e}')
@@ -93,4 +91,4 @@ print('   🔄 Dashboard refresh interval: 5 seconds')
 print('   ⏱️ Time range: Last 5 minutes (now-5m to now)')
 print('   🎯 Data availability: All data points are present and accessible')
 
-client.close()
+executor.shutdown()
@@ -4,21 +4,52 @@ Local validation script for CI/CD workflows.
 This script simulates workflow steps locally for testing.
 """
 
+import hashlib
+import importlib.util
+import mmap
+import shutil
 import subprocess
 import sys
 import os
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
 
+import yaml
 
-def run_command(command, description, cwd=None):
-    """Run a command and return success status"""
+# Prefer the LibYAML-backed loader; PyYAML wheels ship it on most platforms
+try:
+    from yaml import CSafeLoader as _SafeLoader
+except ImportError:
+    from yaml import SafeLoader as _SafeLoader
+
+DOCS_FILES = (
+    "README.md",
+    "docs/ci_cd.md",
+    ".github/workflows/ci.yml",
+    ".github/workflows/deploy_frontend.yml",
+    ".github/workflows/release.yml"
+)
+
+# Empty markers named by the SHA-1 of YAML contents that parsed cleanly
+YAML_CACHE_DIR = Path(".cache/yaml")
+# Below this size a plain read is as cheap as setting up a mapping
+YAML_MMAP_MIN_SIZE = 64 << 10
+
+
+def run_command(command, description, cwd=None, quiet=False):
+    """Run a command and return success status
+
+    With quiet=True stdout goes to /dev/null instead of being read into
+    memory; stderr is still captured for the failure message.
+    """
     print(f"🔄 {description}...")
     try:
-        result = subprocess.run(
+        subprocess.run(
             command,
             shell=True,
             check=True,
-            capture_output=True,
+            stdout=subprocess.DEVNULL if quiet else subprocess.PIPE,
+            stderr=subprocess.PIPE,
             text=True,
             cwd=cwd
         )
@@ -30,6 +61,59 @@ def run_command(command, description, cwd=None):
         return False
 
 
+def check_available(description, module=None, executable=None):
+    """Report whether a Python module or executable is installed
+
+    Looks it up on sys.path / PATH instead of spawning `<tool> --version`.
+    """
+    print(f"🔄 {description}...")
+    if ((module and importlib.util.find_spec(module))
+            or (executable and shutil.which(executable))):
+        print(f"✅ {description} - SUCCESS")
+        return True
+    print(f"❌ {description} - FAILED")
+    return False
+
+
+def _check_yaml_cached(path):
+    """Raise if a YAML file does not parse, skipping files that passed before
+
+    Only validity is cached, never the parsed document, so this returns
+    nothing; callers that need the contents must parse the file themselves.
+    """
+    with open(path, 'rb') as f:
+        # Large files are hashed and parsed straight from the page cache
+        # instead of being copied into a bytes object first
+        if os.fstat(f.fileno()).st_size >= YAML_MMAP_MIN_SIZE:
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as raw:
+                _check_yaml_bytes(raw)
+        else:
+            _check_yaml_bytes(f.read())
+
+
+def _check_yaml_bytes(raw):
+    """Parse YAML from a bytes-like object unless its hash is marked valid"""
+    marker = YAML_CACHE_DIR / f"{hashlib.sha1(raw).hexdigest()}.ok"
+    if marker.exists():
+        return
+
+    yaml.load(raw, Loader=_SafeLoader)
+    try:
+        YAML_CACHE_DIR.mkdir(parents=True, exist_ok=True)
+        marker.touch()
+    except OSError:
+        pass  # Caching is best effort; the parse itself succeeded
+
+
+def _validate_yaml(path):
+    """Parse one YAML file; return (path, error) with error None if valid"""
+    try:
+        _check_yaml_cached(path)
+        return path, None
+    except Exception as e:
+        return path, e
+
+
 def validate_workflows():
     """Validate workflow files and simulate CI steps"""
     print("🚀 LOCAL CI/CD VALIDATION")
@@ -52,16 +136,18 @@ def validate_workflows():
         ".github/workflows/release.yml"
     ]
 
-    for workflow in workflow_files:
+    # The files are independent; read and parse them concurrently, then
+    # report in list order
+    with ThreadPoolExecutor(max_workers=len(workflow_files)) as executor:
+        yaml_results = list(executor.map(_validate_yaml, workflow_files))
+
+    for workflow, error in yaml_results:
         total_tests += 1
-        try:
-            import yaml
-            with open(workflow, 'r') as f:
-                yaml.safe_load(f)
+        if error is None:
             print(f"✅ {workflow} - Valid YAML")
             success_count += 1
-        except Exception as e:
-            print(f"❌ {workflow} - Invalid YAML: {e}")
+        else:
+            print(f"❌ {workflow} - Invalid YAML: {error}")
 
     # 2. Python backend validation
     print("\n🐍 Python Backend Validation")
@@ -77,17 +163,19 @@ def validate_workflows():
 
     # Run flake8 if available
     total_tests += 1
-    if run_command("python -m flake8 --version", "Check flake8 availability"):
+    if check_available("Check flake8 availability", module="flake8"):
         if run_command(
             "python -m flake8 . --count --select=E9,F63,F7,F82 --exclude=venv,env,.venv,.env,node_modules",
-            "Python syntax check"
+            "Python syntax check",
+            quiet=True
         ):
             success_count += 1
 
     # Run pytest if available
     total_tests += 1
-    if run_command("python -m pytest --version", "Check pytest availability"):
-        if run_command("python -m pytest FAT_tests/ --collect-only", "Test discovery"):
+    if check_available("Check pytest availability", module="pytest"):
+        if run_command("python -m pytest FAT_tests/ --collect-only", "Test discovery",
+                       quiet=True):
             success_count += 1
 
     # 3. Frontend validation
@@ -96,8 +184,8 @@ def validate_workflows():
 
     # Check package.json
     total_tests += 1
-    frontend_package = Path("frontend/package.json")
-    if frontend_package.exists():
+    frontend_package_exists = os.path.isfile("frontend/package.json")
+    if frontend_package_exists:
         print("✅ frontend/package.json found")
         success_count += 1
     else:
@@ -105,13 +193,16 @@ def validate_workflows():
 
     # Check Node.js availability
     total_tests += 1
-    if run_command("node --version", "Check Node.js availability"):
+    node_available = check_available("Check Node.js availability",
+                                      executable="node")
+    if node_available:
         success_count += 1
 
-    # Check npm scripts
+    # Check npm scripts (counted as failed without Node.js to run them)
     total_tests += 1
-    if frontend_package.exists():
-        if run_command("npm run build --if-present", "Frontend build check", cwd="frontend"):
+    if frontend_package_exists and node_available:
+        if run_command("npm run build --if-present", "Frontend build check",
+                       cwd="frontend", quiet=True):
             success_count += 1
 
     # 4. Docker validation
@@ -119,29 +210,28 @@ def validate_workflows():
     print("-" * 30)
 
     total_tests += 1
-    if run_command("docker --version", "Check Docker availability"):
+    docker_available = check_available("Check Docker availability",
+                                        executable="docker")
+    if docker_available:
         success_count += 1
 
+    # Compose validation needs Docker; counted as failed without it
     total_tests += 1
-    if Path("docker-compose.yml").exists():
-        if run_command("docker-compose config", "Docker Compose validation"):
+    if docker_available and Path("docker-compose.yml").exists():
+        if run_command("docker-compose config", "Docker Compose validation",
+                       quiet=True):
             success_count += 1
 
     # 5. Documentation validation
     print("\n📚 Documentation Validation")
     print("-" * 30)
 
-    docs_files = [
-        "README.md",
-        "docs/ci_cd.md",
-        ".github/workflows/ci.yml",
-        ".github/workflows/deploy_frontend.yml",
-        ".github/workflows/release.yml"
-    ]
+    with ThreadPoolExecutor(max_workers=len(DOCS_FILES)) as executor:
+        docs_exist = list(executor.map(os.path.isfile, DOCS_FILES))
 
-    for doc in docs_files:
+    for doc, exists in zip(DOCS_FILES, docs_exist):
         total_tests += 1
-        if Path(doc).exists():
+        if exists:
             print(f"✅ {doc} exists")
             success_count += 1
         else:
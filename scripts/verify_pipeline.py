@@ -13,38 +13,76 @@ This script systematically checks all components of the telemetry pipeline:
 Usage: python scripts/verify_pipeline.py
 """
 
+from __future__ import annotations
+
 import asyncio
 import json
 import logging
+import shutil
 import subprocess
 import sys
 import time
 from datetime import datetime
 from typing import Dict, List, Optional, Tuple
 
-import aiohttp
 import paho.mqtt.client as mqtt
-import requests
-from influxdb_client import InfluxDBClient
+
+# aiohttp is not in requirements.txt; without it the HTTP checks report a
+# failure and the rest of the verification still runs
+try:
+    import aiohttp
+except ImportError:
+    aiohttp = None
+
+from common import (INFLUXDB_BUCKET, INFLUXDB_URL, close_client, get_client,
+                    get_query_api, record_count)
 
 # Configuration
 DOCKER_SERVICES = ['mosquitto', 'influxdb', 'grafana']
 MQTT_BROKER = 'localhost'
 MQTT_PORT = 1883
-INFLUXDB_URL = 'http://localhost:8086'
-INFLUXDB_TOKEN = 'telemetry-token-12345'
-INFLUXDB_ORG = 'telemetry'
-INFLUXDB_BUCKET = 'building_data'
 GRAFANA_URL = 'http://localhost:3000'
 API_URL = 'http://localhost:8000'
 FRONTEND_URL = 'http://localhost:3001'
 
+# Flux for the InfluxDB checks; fixed for the configured bucket
+RECENT_TELEMETRY_QUERY = f'''
+from(bucket: "{INFLUXDB_BUCKET}")
+|> range(start: -24h)
+|> filter(fn: (r) => r._measurement == "telemetry")
+|> limit(n: 5)
+'''
+
+TEST_MESSAGE_QUERY = f'''
+from(bucket: "{INFLUXDB_BUCKET}")
+|> range(start: -1h)
+|> filter(fn: (r) => r._measurement == "telemetry")
+|> filter(fn: (r) => r.device_id == "TEST_VERIFICATION_AHU")
+'''
+
+# How long to wait for the test message to reach InfluxDB, and how often to look
+DATA_FLOW_TIMEOUT = 10.0
+DATA_FLOW_POLL_INTERVAL = 0.25
+
 # Configure logging
 logging.basicConfig(level=logging.INFO,
                     format='%(asctime)s - %(levelname)s - %(message)s')
 logger = logging.getLogger(__name__)
 
 
+def first_record(query_api, query: str):
+    """Return the first record a Flux query streams back, or None
+
+    Closing the stream after one record drops the HTTP response, so the
+    server stops sending the rest.
+    """
+    records = query_api.query_stream(query=query)
+    try:
+        return next(records, None)
+    finally:
+        records.close()
+
+
 class TelemetryVerifier:
     """Comprehensive telemetry pipeline verification"""
 
@@ -60,35 +98,51 @@ class TelemetryVerifier:
             'data_flow': False,
             'overall_health': False
         }
+        self._session: Optional[aiohttp.ClientSession] = None
+        # Running health tally, updated by each check as its result lands
+        self._passed = 0
+        self._total = 0
+
+    def _tally(self, ok: bool) -> None:
+        """Count one check result towards the overall health score"""
+        self._total += 1
+        self._passed += bool(ok)
+
+    def _get_session(self) -> aiohttp.ClientSession:
+        """Return the HTTP session shared by all checks, creating it on first use"""
+        if aiohttp is None:
+            raise RuntimeError("aiohttp is not installed")
+        if self._session is None:
+            self._session = aiohttp.ClientSession()
+        return self._session
 
     async def verify_all(self) -> Dict:
         """Run all verification checks"""
         logger.info("🔍 TELEMETRY PIPELINE COMPREHENSIVE VERIFICATION")
         logger.info("=" * 60)
 
-        # Step 1: Docker Services
-        await self.check_docker_services()
-
-        # Step 2: Network Connectivity
-        await self.check_network_connectivity()
-
-        # Step 3: InfluxDB Connection
-        await self.check_influxdb()
-
-        # Step 4: MQTT Connection
-        await self.check_mqtt()
-
-        # Step 5: API Endpoints
-        await self.check_api_endpoints()
-
-        # Step 6: Grafana Access
-        await self.check_grafana()
-
-        # Step 7: Frontend Access
-        await self.check_frontend()
-
-        # Step 8: End-to-End Data Flow
-        await self.test_data_flow()
+        try:
+            # Steps 1-7: independent probes, run concurrently so the total
+            # wait is the slowest timeout rather than the sum of them
+            await asyncio.gather(
+                self.check_docker_services(),
+                self.check_network_connectivity(),
+                self.check_influxdb(),
+                self.check_mqtt(),
+                self.check_api_endpoints(),
+                self.check_grafana(),
+                self.check_frontend(),
+                return_exceptions=True
+            )
+
+            # Step 8: End-to-End Data Flow (needs the MQTT/InfluxDB results)
+            await self.test_data_flow()
+        finally:
+            if self._session is not None:
+                await self._session.close()
+                self._session = None
+            # Both InfluxDB checks used the shared client; it is done now
+            close_client()
 
         # Step 9: Overall Assessment
         self.assess_overall_health()
@@ -102,28 +156,36 @@ class TelemetryVerifier:
         """Check Docker service status"""
         logger.info("\\n1️⃣ Checking Docker Services...")
 
+        if shutil.which('docker') is None:
+            logger.error("❌ Docker CLI not found on PATH")
+            return
+
         try:
-            result = subprocess.run(['docker-compose', 'ps'],
-                                    capture_output=True, text=True, timeout=10)
+            # One `docker ps` lists every container; the services are matched
+            # in Python. The blocking call runs in a worker thread to keep
+            # the loop free for the other checks
+            result = await asyncio.to_thread(
+                subprocess.run, ['docker', 'ps', '--format', '{{json .}}'],
+                capture_output=True, text=True, timeout=10)
 
             if result.returncode == 0:
-                logger.info("✅ Docker Compose is accessible")
+                logger.info("✅ Docker is accessible")
 
+                containers = [json.loads(line)
+                              for line in result.stdout.splitlines() if line]
                 for service in DOCKER_SERVICES:
-                    service_check = subprocess.run(
-                        ['docker', 'ps', '--filter',
-                            f'name={service}', '--format', 'table {{.Names}}\\t{{.Status}}'],
-                        capture_output=True, text=True, timeout=10
-                    )
-
-                    if service in service_check.stdout and 'Up' in service_check.stdout:
-                        self.verification_results['docker_services'][service] = True
+                    # `docker ps --filter name=` matches substrings of names
+                    running = any(service in container.get('Names', '')
+                                  and 'Up' in container.get('Status', '')
+                                  for container in containers)
+                    self.verification_results['docker_services'][service] = running
+                    self._tally(running)
+                    if running:
                         logger.info(f"  ✅ {service}: Running")
                     else:
-                        self.verification_results['docker_services'][service] = False
                         logger.warning(f"  ❌ {service}: Not running")
             else:
-                logger.error("❌ Docker Compose not accessible")
+                logger.error("❌ Docker not accessible")
 
         except Exception as e:
             logger.error(f"❌ Docker check failed: {e}")
@@ -138,69 +200,68 @@ class TelemetryVerifier:
             'Grafana': (GRAFANA_URL, 3000)
         }
 
-        for name, (host, port) in endpoints.items():
-            try:
-                if name == 'Mosquitto':
-                    # Test MQTT port specifically
-                    import socket
-                    sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-                    sock.settimeout(5)
-                    result = sock.connect_ex((MQTT_BROKER, MQTT_PORT))
-                    sock.close()
-
-                    if result == 0:
-                        self.verification_results['network_connectivity'][name] = True
-                        logger.info(f"  ✅ {name}: Port {port} accessible")
-                    else:
-                        self.verification_results['network_connectivity'][name] = False
-                        logger.warning(
-                            f"  ❌ {name}: Port {port} not accessible")
+        probes = await asyncio.gather(
+            *(self._probe_endpoint(name, host, port)
+              for name, (host, port) in endpoints.items()))
+        for name, reachable in probes:
+            self.verification_results['network_connectivity'][name] = reachable
+            self._tally(reachable)
+
+    async def _probe_endpoint(self, name: str, host: str, port: int) -> Tuple[str, bool]:
+        """Probe one service endpoint; return (name, reachable)"""
+        try:
+            if name == 'Mosquitto':
+                # Test MQTT port specifically
+                try:
+                    _, writer = await asyncio.wait_for(
+                        asyncio.open_connection(MQTT_BROKER, MQTT_PORT),
+                        timeout=5)
+                    writer.close()
+                    port_open = True
+                except (OSError, asyncio.TimeoutError):
+                    port_open = False
+
+                if port_open:
+                    logger.info(f"  ✅ {name}: Port {port} accessible")
                 else:
-                    # Test HTTP endpoints
-                    async with aiohttp.ClientSession(timeout=aiohttp.ClientTimeout(total=5)) as session:
-                        url = host.replace('localhost', '127.0.0.1')
-                        async with session.get(url) as response:
-                            if response.status < 500:
-                                self.verification_results['network_connectivity'][name] = True
-                                logger.info(
-                                    f"  ✅ {name}: HTTP accessible (status: {response.status})")
-                            else:
-                                self.verification_results['network_connectivity'][name] = False
-                                logger.warning(
-                                    f"  ❌ {name}: HTTP error (status: {response.status})")
-
-            except Exception as e:
-                self.verification_results['network_connectivity'][name] = False
-                logger.warning(f"  ❌ {name}: Connection failed - {e}")
+                    logger.warning(f"  ❌ {name}: Port {port} not accessible")
+                return name, port_open
+
+            # Test HTTP endpoints
+            url = host.replace('localhost', '127.0.0.1')
+            async with self._get_session().get(
+                    url, timeout=aiohttp.ClientTimeout(total=5)) as response:
+                if response.status < 500:
+                    logger.info(
+                        f"  ✅ {name}: HTTP accessible (status: {response.status})")
+                    return name, True
+                logger.warning(
+                    f"  ❌ {name}: HTTP error (status: {response.status})")
+                return name, False
+
+        except Exception as e:
+            logger.warning(f"  ❌ {name}: Connection failed - {e}")
+            return name, False
 
     async def check_influxdb(self):
         """Check InfluxDB connection and data"""
         logger.info("\\n3️⃣ Checking InfluxDB...")
 
         try:
-            client = InfluxDBClient(
-                url=INFLUXDB_URL, token=INFLUXDB_TOKEN, org=INFLUXDB_ORG)
+            client = get_client()
 
             # Health check
-            health = client.health()
+            health = await asyncio.to_thread(client.health)
             if health.status == "pass":
                 logger.info("  ✅ InfluxDB: Health check passed")
 
                 # Check for data
-                query_api = client.query_api()
-                query = f'''
-                from(bucket: "{INFLUXDB_BUCKET}")
-                |> range(start: -24h)
-                |> filter(fn: (r) => r._measurement == "telemetry")
-                |> limit(n: 5)
-                '''
-
-                result = query_api.query(query=query)
-                record_count = sum(len(table.records) for table in result)
-
-                if record_count > 0:
-                    logger.info(
-                        f"  ✅ InfluxDB: Found {record_count} telemetry records")
+                query_api = get_query_api()
+                first = await asyncio.to_thread(first_record, query_api,
+                                                RECENT_TELEMETRY_QUERY)
+
+                if first is not None:
+                    logger.info("  ✅ InfluxDB: Found recent telemetry records")
                 else:
                     logger.info(
                         "  ⚠️  InfluxDB: No telemetry data found (may be expected if just started)")
@@ -209,36 +270,58 @@ class TelemetryVerifier:
             else:
                 logger.error(f"  ❌ InfluxDB: Health check failed - {health}")
 
-            client.close()
-
         except Exception as e:
             logger.error(f"  ❌ InfluxDB: Connection failed - {e}")
 
+        self._tally(self.verification_results['influxdb_connection'])
+
     async def check_mqtt(self):
         """Check MQTT broker connection"""
         logger.info("\\n4️⃣ Checking MQTT Broker...")
 
         try:
-            def on_connect(client, userdata, flags, rc):
+            # on_connect runs on paho's network thread; it wakes the check as
+            # soon as the CONNACK arrives instead of after a fixed wait
+            loop = asyncio.get_running_loop()
+            connack = asyncio.Event()
+
+            def on_connect(client, userdata, flags, rc, properties=None):
                 if rc == 0:
                     logger.info("  ✅ MQTT: Successfully connected to broker")
                     self.verification_results['mqtt_connection'] = True
                 else:
                     logger.error(f"  ❌ MQTT: Connection failed with code {rc}")
+                loop.call_soon_threadsafe(connack.set)
 
-            client = mqtt.Client()
+            # A throwaway MQTT 5 session: clean start and short keepalive. The
+            # pinned paho has no public connect timeout, so the blocking
+            # connect is bounded here to match the CONNACK wait below
+            client = mqtt.Client(protocol=mqtt.MQTTv5)
             client.on_connect = on_connect
-            client.connect(MQTT_BROKER, MQTT_PORT, 10)
+            try:
+                await asyncio.wait_for(
+                    asyncio.to_thread(client.connect, MQTT_BROKER, MQTT_PORT,
+                                      keepalive=5, clean_start=True),
+                    timeout=2)
+            except asyncio.TimeoutError:
+                logger.error("  ❌ MQTT: TCP connect to broker timed out after 2s")
+                self._tally(False)
+                return
             client.loop_start()
 
             # Wait for connection
-            time.sleep(2)
+            try:
+                await asyncio.wait_for(connack.wait(), timeout=2)
+            except asyncio.TimeoutError:
+                logger.error("  ❌ MQTT: No CONNACK from broker within 2s")
             client.loop_stop()
             client.disconnect()
 
         except Exception as e:
             logger.error(f"  ❌ MQTT: Connection failed - {e}")
 
+        self._tally(self.verification_results['mqtt_connection'])
+
     async def check_api_endpoints(self):
         """Check API endpoints"""
         logger.info("\\n5️⃣ Checking API Endpoints...")
@@ -249,56 +332,63 @@ class TelemetryVerifier:
             'stats': f'{API_URL}/stats'
         }
 
-        async with aiohttp.ClientSession(timeout=aiohttp.ClientTimeout(total=10)) as session:
-            for name, url in endpoints.items():
-                try:
-                    async with session.get(url) as response:
-                        if response.status == 200:
-                            data = await response.json()
-                            self.verification_results['api_endpoints'][name] = True
-                            logger.info(
-                                f"  ✅ API {name}: Accessible (status: {response.status})")
-                        else:
-                            self.verification_results['api_endpoints'][name] = False
-                            logger.warning(
-                                f"  ❌ API {name}: Error (status: {response.status})")
+        probes = await asyncio.gather(
+            *(self._probe_api(name, url) for name, url in endpoints.items()))
+        for name, ok in probes:
+            self.verification_results['api_endpoints'][name] = ok
+            self._tally(ok)
 
-                except Exception as e:
-                    self.verification_results['api_endpoints'][name] = False
-                    logger.warning(f"  ❌ API {name}: Connection failed - {e}")
+    async def _probe_api(self, name: str, url: str) -> Tuple[str, bool]:
+        """GET one API endpoint; return (name, ok)"""
+        try:
+            async with self._get_session().get(
+                    url, timeout=aiohttp.ClientTimeout(total=10)) as response:
+                if response.status == 200:
+                    logger.info(
+                        f"  ✅ API {name}: Accessible (status: {response.status})")
+                    return name, True
+                logger.warning(
+                    f"  ❌ API {name}: Error (status: {response.status})")
+                return name, False
+
+        except Exception as e:
+            logger.warning(f"  ❌ API {name}: Connection failed - {e}")
+            return name, False
 
     async def check_grafana(self):
         """Check Grafana access"""
         logger.info("\\n6️⃣ Checking Grafana...")
 
         try:
-            async with aiohttp.ClientSession(timeout=aiohttp.ClientTimeout(total=10)) as session:
-                async with session.get(GRAFANA_URL) as response:
-                    if response.status == 200:
-                        self.verification_results['grafana_access'] = True
-                        logger.info("  ✅ Grafana: Accessible")
-                        logger.info(f"  📊 Grafana Dashboard: {GRAFANA_URL}")
-                    else:
-                        logger.warning(
-                            f"  ❌ Grafana: Error (status: {response.status})")
+            async with self._get_session().get(
+                    GRAFANA_URL, timeout=aiohttp.ClientTimeout(total=10)) as response:
+                if response.status == 200:
+                    self.verification_results['grafana_access'] = True
+                    logger.info("  ✅ Grafana: Accessible")
+                    logger.info(f"  📊 Grafana Dashboard: {GRAFANA_URL}")
+                else:
+                    logger.warning(
+                        f"  ❌ Grafana: Error (status: {response.status})")
 
         except Exception as e:
             logger.warning(f"  ❌ Grafana: Connection failed - {e}")
 
+        self._tally(self.verification_results['grafana_access'])
+
     async def check_frontend(self):
         """Check frontend access"""
         logger.info("\\n7️⃣ Checking Frontend...")
 
         try:
-            async with aiohttp.ClientSession(timeout=aiohttp.ClientTimeout(total=10)) as session:
-                async with session.get(FRONTEND_URL) as response:
-                    if response.status == 200:
-                        self.verification_results['frontend_access'] = True
-                        logger.info("  ✅ Frontend: Accessible")
-                        logger.info(f"  🌐 React Dashboard: {FRONTEND_URL}")
-                    else:
-                        logger.warning(
-                            f"  ❌ Frontend: Error (status: {response.status})")
+            async with self._get_session().get(
+                    FRONTEND_URL, timeout=aiohttp.ClientTimeout(total=10)) as response:
+                if response.status == 200:
+                    self.verification_results['frontend_access'] = True
+                    logger.info("  ✅ Frontend: Accessible")
+                    logger.info(f"  🌐 React Dashboard: {FRONTEND_URL}")
+                else:
+                    logger.warning(
+                        f"  ❌ Frontend: Error (status: {response.status})")
 
         except Exception as e:
             logger.warning(f"  ❌ Frontend: Not running - {e}")
@@ -333,36 +423,28 @@ class TelemetryVerifier:
 
             client.disconnect()
 
-            # Wait a bit for processing
-            await asyncio.sleep(5)
-
-            # Check if data appeared in InfluxDB
+            # Check if data appeared in InfluxDB, polling until the collector
+            # has written it rather than sleeping a fixed time
             if self.verification_results['influxdb_connection']:
                 try:
-                    client = InfluxDBClient(
-                        url=INFLUXDB_URL, token=INFLUXDB_TOKEN, org=INFLUXDB_ORG)
-                    query_api = client.query_api()
-
-                    query = f'''
-                    from(bucket: "{INFLUXDB_BUCKET}")
-                    |> range(start: -1h)
-                    |> filter(fn: (r) => r._measurement == "telemetry")
-                    |> filter(fn: (r) => r.device_id == "TEST_VERIFICATION_AHU")
-                    '''
+                    query_api = get_query_api()
 
-                    result = query_api.query(query=query)
-                    record_count = sum(len(table.records) for table in result)
+                    deadline = time.monotonic() + DATA_FLOW_TIMEOUT
+                    while True:
+                        count = await asyncio.to_thread(
+                            record_count, query_api, TEST_MESSAGE_QUERY)
+                        if count > 0 or time.monotonic() >= deadline:
+                            break
+                        await asyncio.sleep(DATA_FLOW_POLL_INTERVAL)
 
-                    if record_count > 0:
+                    if count > 0:
                         self.verification_results['data_flow'] = True
                         logger.info(
-                            f"  ✅ Data Flow: Test message found in InfluxDB ({record_count} records)")
+                            f"  ✅ Data Flow: Test message found in InfluxDB ({count} records)")
                     else:
                         logger.warning(
                             "  ⚠️  Data Flow: Test message not found in InfluxDB")
 
-                    client.close()
-
                 except Exception as e:
                     logger.warning(
                         f"  ⚠️  Data Flow: Could not verify in InfluxDB - {e}")
@@ -374,28 +456,11 @@ class TelemetryVerifier:
         """Assess overall system health"""
         logger.info("\\n9️⃣ Overall Health Assessment...")
 
-        # Count successful checks
-        docker_ok = sum(self.verification_results['docker_services'].values())
-        network_ok = sum(
-            self.verification_results['network_connectivity'].values())
-        api_ok = sum(self.verification_results['api_endpoints'].values())
-
-        total_checks = (
-            len(self.verification_results['docker_services']) +
-            len(self.verification_results['network_connectivity']) +
-            len(self.verification_results['api_endpoints']) +
-            3  # influxdb, mqtt, grafana individual checks
-        )
-
-        successful_checks = (
-            docker_ok + network_ok + api_ok +
-            (1 if self.verification_results['influxdb_connection'] else 0) +
-            (1 if self.verification_results['mqtt_connection'] else 0) +
-            (1 if self.verification_results['grafana_access'] else 0)
-        )
-
-        health_percentage = (successful_checks / total_checks) * \
-            100 if total_checks > 0 else 0
+        # The checks tallied their own results as they finished: every
+        # docker service, network endpoint and API endpoint, plus the
+        # influxdb, mqtt and grafana checks
+        health_percentage = (self._passed / self._total) * \
+            100 if self._total > 0 else 0
 
         self.verification_results['overall_health'] = health_percentage
 
@@ -8,19 +8,44 @@ python simulator/ahu_simulator.py --mode live --cadence 5
 import argparse
 import json
 import logging
+import os
 import time
 import signal
 import sys
 from typing import Dict, Any, Optional
 from dataclasses import dataclass
+from functools import lru_cache
+from pathlib import Path
 import threading
+import msgpack
+import numpy as np
 import yaml
 import requests
 import paho.mqtt.client as mqtt
-from datetime import datetime
 import random
 import math
 
+# Numba is optional: with it the control kernels below are compiled, without
+# it they run as ordinary Python
+try:
+    from numba import njit
+except ImportError:
+    def njit(*args, **kwargs):
+        if len(args) == 1 and callable(args[0]):
+            return args[0]
+        return lambda func: func
+
+# orjson is optional too (it has no PyPy build): the stdlib fallback produces
+# the same compact documents, only slower
+try:
+    from orjson import dumps as _json_dumps, loads as _json_loads
+except ImportError:
+    def _json_dumps(obj: Any) -> bytes:
+        return json.dumps(obj, ensure_ascii=False,
+                          separators=(',', ':')).encode()
+
+    _json_loads = json.loads
+
 # Configure logging
 logging.basicConfig(
     level=logging.INFO,
@@ -28,8 +53,95 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
-
-@dataclass
+# Per-update probabilities of raising a random alarm / clearing an active one
+ALARM_PROBABILITY = 0.001
+ALARM_CLEAR_PROBABILITY = 0.01
+ALARM_NAMES = ("High Supply Temp", "Low Airflow", "Filter Alarm", "Sensor Fault")
+
+# Simulated outside temperature by hour of day (daily sine, peak at noon)
+DIURNAL_TEMPS = tuple(20.0 + 10.0 * math.sin((hour - 6) * math.pi / 12)
+                      for hour in range(24))
+
+# Control noise is pre-drawn this many ticks at a time
+RNG_BUFFER_SIZE = 8192
+
+# Live weather: Open-Meteo current conditions, refetched at most once per TTL
+WEATHER_URL = "https://api.open-meteo.com/v1/forecast"
+WEATHER_TTL_S = 300.0
+# Retry interval for the background refresh after a failed fetch
+WEATHER_RETRY_S = 30.0
+
+# Set by the signal handler; run() finishes its current tick and stops
+_STOP = threading.Event()
+
+
+@lru_cache(maxsize=None)
+def _json_string(value: Optional[str]) -> str:
+    """JSON-encode a string point (None becomes null)"""
+    return _json_dumps(value).decode()
+
+
+@njit(cache=True)
+def pid_step(kp: float, ki: float, kd: float, integral_limit: float,
+             integral: float, prev_error: float, error: float, dt: float):
+    """One PID update on plain floats; returns (output, new_integral)"""
+    integral = min(integral_limit, max(-integral_limit, integral + error * dt))
+    derivative = (error - prev_error) / dt if dt > 0 else 0.0
+    return kp * error + ki * integral + kd * derivative, integral
+
+
+@njit(cache=True)
+def ddc_step(supply_temp: float, outside_temp: float, setpoint: float,
+             pid_output: float, dt: float, noise: float):
+    """VFD, economizer and plant update for one tick
+
+    Returns (supply_temp, vfd_speed, economizer_position).
+    """
+    # Update VFD speed based on PID output (0-100% range)
+    # When supply temp is below setpoint (cooling not needed), reduce speed
+    if supply_temp - setpoint < -2.0:  # Much colder than needed
+        vfd_speed = max(0.0, min(100.0, 20.0 + pid_output * 5.0))
+    else:  # Normal or warm
+        vfd_speed = max(0.0, min(100.0, 50.0 + pid_output * 10.0))
+
+    # Economizer logic based on outside temperature
+    if outside_temp < setpoint + 2.0:
+        # Use free cooling when outside temp is favorable
+        economizer_position = min(100.0, (setpoint + 2.0 - outside_temp) * 25.0)
+    else:
+        economizer_position = 0.0
+
+    # Simulate supply air temperature response with more effective cooling
+    cooling_effect = (vfd_speed - 50.0) / 50.0 * 1.5  # More cooling effect
+    economizer_effect = economizer_position / 100.0 * \
+        (outside_temp - supply_temp) * 0.1
+
+    temp_change = -cooling_effect + economizer_effect + noise
+    return supply_temp + temp_change * dt, vfd_speed, economizer_position
+
+
+@njit(cache=True)
+def ddc_run(supply_temp, outside_temp, setpoint, vfd_speed, economizer_position,
+            kp, ki, kd, integral_limit, integral, prev_error, dts, noise):
+    """Step the PID and plant through every tick in dts
+
+    Returns (supply temperature history, supply_temp, vfd_speed,
+    economizer_position, integral, prev_error) after the last tick.
+    """
+    history = np.empty(dts.size)
+    for k in range(dts.size):
+        error = supply_temp - setpoint
+        pid_output, integral = pid_step(kp, ki, kd, integral_limit,
+                                        integral, prev_error, error, dts[k])
+        prev_error = error
+        supply_temp, vfd_speed, economizer_position = ddc_step(
+            supply_temp, outside_temp, setpoint, pid_output, dts[k], noise[k])
+        history[k] = supply_temp
+    return (history, supply_temp, vfd_speed, economizer_position,
+            integral, prev_error)
+
+
+@dataclass(slots=True)
 class AHUState:
     """Air Handling Unit state variables"""
     supply_temp: float = 18.0
@@ -41,21 +153,46 @@ class AHUState:
     economizer_position: float = 0.0
 
 
+def ddc_step_array(supply_temp: np.ndarray, outside_temp: float,
+                   setpoint: np.ndarray, pid_output: np.ndarray, dt: float,
+                   noise: np.ndarray):
+    """ddc_step() over arrays of AHUs sharing one outside temperature"""
+    vfd_speed = np.where(supply_temp - setpoint < -2.0,
+                         20.0 + pid_output * 5.0, 50.0 + pid_output * 10.0)
+    np.clip(vfd_speed, 0.0, 100.0, out=vfd_speed)
+
+    economizer_position = np.clip(
+        (setpoint + 2.0 - outside_temp) * 25.0, 0.0, 100.0)
+
+    cooling_effect = (vfd_speed - 50.0) / 50.0 * 1.5
+    economizer_effect = economizer_position / 100.0 * \
+        (outside_temp - supply_temp) * 0.1
+
+    temp_change = -cooling_effect + economizer_effect + noise
+    return supply_temp + temp_change * dt, vfd_speed, economizer_position
+
+
 class PIDController:
     """Simple PID controller for temperature control"""
 
-    def __init__(self, kp: float = 1.0, ki: float = 0.1, kd: float = 0.05):
+    def __init__(self, kp: float = 1.0, ki: float = 0.1, kd: float = 0.05,
+                 integral_limit: float = 50.0):
         self.kp = kp
         self.ki = ki
         self.kd = kd
+        self.integral_limit = integral_limit
         self.prev_error = 0.0
         self.integral = 0.0
 
     def update(self, error: float, dt: float) -> float:
-        """Update PID controller and return control output"""
-        self.integral += error * dt
-        derivative = (error - self.prev_error) / dt if dt > 0 else 0.0
-        output = self.kp * error + self.ki * self.integral + self.kd * derivative
+        """Update PID controller and return control output
+
+        The integral term is clamped to +/- integral_limit (anti-windup) so a
+        long saturated error cannot wind it up without bound.
+        """
+        output, self.integral = pid_step(
+            self.kp, self.ki, self.kd, self.integral_limit,
+            self.integral, self.prev_error, error, dt)
         self.prev_error = error
         return output
 
@@ -69,120 +206,283 @@ class AHUSimulator:
         self.pid = PIDController(
             kp=config.get('pid_kp', 2.0),
             ki=config.get('pid_ki', 0.1),
-            kd=config.get('pid_kd', 0.05)
+            kd=config.get('pid_kd', 0.05),
+            integral_limit=config.get('pid_integral_limit', 50.0)
         )
         self.running = False
         self.mqtt_client = None
-        self.last_update = time.time()
+        self._rng = np.random.default_rng()
+        self._refill_draws()
+        self._alarm_in = int(self._rng.geometric(ALARM_PROBABILITY))
+        self._clear_in = int(self._rng.geometric(ALARM_CLEAR_PROBABILITY))
+
+        # Monotonic clock: dt must not jump when the wall clock is stepped
+        self.last_update = time.monotonic()
+
+        # Weather changes over minutes, not ticks; keep the last live reading
+        # and a keep-alive session for the occasional refresh
+        self._weather_session = requests.Session()
+        self._weather_cache = {'ts': 0.0, 'temp': None}
+        # Whether the last live fetch succeeded; the cache keeps the last good
+        # reading after a failure, so it cannot tell the two apart
+        self._weather_ok = False
+        self._weather_ttl = config.get('weather_ttl_s', WEATHER_TTL_S)
+        # Optional file shared by simulator processes on this host, so only
+        # one of them fetches per TTL window
+        weather_file = config.get('weather_cache_file')
+        self._weather_file = Path(weather_file) if weather_file else None
+        self._weather_thread: Optional[threading.Thread] = None
+        self._stop_event = threading.Event()
+
+        # Optional publish batching: with a batch size above 1, payloads are
+        # coalesced into one MQTT message holding a list of them
+        self._batch_size = config.get('publish_batch_size', 1)
+        self._batch_max_age = config.get('publish_batch_max_ms', 10_000) / 1000.0
+        self._pending = []
+        self._pending_since = 0.0
+
+        # Static part of the JSON payload, encoded once; None for msgpack
+        self._json_ids = None
+        if config.get('payload_format', 'json') != 'msgpack':
+            self._json_ids = _json_dumps({
+                "device": config.get('device_id', 'ahu1'),
+                "building": config.get('building_id', 'demo_building'),
+            })[1:-1].decode()
 
         # Initialize MQTT client
         self._setup_mqtt()
 
     def _setup_mqtt(self) -> None:
         """Setup MQTT client connection"""
-        self.mqtt_client = mqtt.Client()
+        # MQTT 5 over TCP with a stable per-device client id
+        self.mqtt_client = mqtt.Client(
+            client_id=f"ahu-{self.config.get('device_id', 'ahu1')}",
+            protocol=mqtt.MQTTv5, transport='tcp')
         self.mqtt_client.on_connect = self._on_mqtt_connect
         self.mqtt_client.on_disconnect = self._on_mqtt_disconnect
 
         broker_host = self.config.get('mqtt_broker', 'localhost')
         broker_port = self.config.get('mqtt_port', 1883)
 
+        # No network thread: run() drives the client's loop while it waits
+        # for the next tick, and QoS 0 publishes are written out directly
         try:
             self.mqtt_client.connect(broker_host, broker_port, 60)
-            self.mqtt_client.loop_start()
+            self.mqtt_client.loop(timeout=1.0)  # read the CONNACK
         except Exception as e:
             logger.error(f"Failed to connect to MQTT broker: {e}")
 
-    def _on_mqtt_connect(self, client, userdata, flags, rc):
+    def _service_mqtt(self, deadline: float) -> None:
+        """Run the MQTT network loop on this thread until the deadline"""
+        while True:
+            remaining = max(0.0, deadline - time.monotonic())
+            rc = self.mqtt_client.loop(timeout=remaining)
+            if rc != mqtt.MQTT_ERR_SUCCESS:
+                # Connection lost: sit out the rest of the tick, then retry
+                time.sleep(max(0.0, deadline - time.monotonic()))
+                try:
+                    self.mqtt_client.reconnect()
+                except Exception as e:
+                    logger.warning("MQTT reconnect failed: %s", e)
+                return
+            if remaining == 0.0:
+                return
+
+    def _on_mqtt_connect(self, client, userdata, flags, rc, properties=None):
         """MQTT connection callback"""
         if rc == 0:
             logger.info("Connected to MQTT broker")
         else:
             logger.error(f"Failed to connect to MQTT broker: {rc}")
 
-    def _on_mqtt_disconnect(self, client, userdata, rc):
+    def _on_mqtt_disconnect(self, client, userdata, rc, properties=None):
         """MQTT disconnection callback"""
         logger.info("Disconnected from MQTT broker")
 
-    def get_outside_temp(self, mode: str) -> float:
-        """Get outside temperature from API or simulation"""
+    def get_outside_temp(self, mode: str, hour: Optional[int] = None) -> float:
+        """Get outside temperature from API or simulation
+
+        hour is the local hour of day for the simulation; by default it is
+        read from the clock.
+        """
         if mode == 'live':
+            cache = self._weather_cache
+            if (cache['temp'] is not None
+                    and time.monotonic() - cache['ts'] < self._weather_ttl):
+                return cache['temp']
+            location = (self.config.get('latitude', 40.7128),
+                        self.config.get('longitude', -74.0060))
+            shared = self._read_shared_weather(location)
+            if shared is not None:
+                self._weather_ok = True
+                return shared
             try:
                 # Use Open-Meteo API for real weather data
-                url = "https://api.open-meteo.com/v1/forecast"
                 params = {
-                    'latitude': self.config.get('latitude', 40.7128),
-                    'longitude': self.config.get('longitude', -74.0060),
+                    'latitude': location[0],
+                    'longitude': location[1],
                     'current_weather': 'true',
                     'temperature_unit': 'celsius'
                 }
-                response = requests.get(url, params=params, timeout=5)
+                response = self._weather_session.get(
+                    WEATHER_URL, params=params, timeout=5)
                 if response.status_code == 200:
                     data = response.json()
-                    return data['current_weather']['temperature']
+                    temp = data['current_weather']['temperature']
+                    self._weather_cache = {'ts': time.monotonic(), 'temp': temp}
+                    self._write_shared_weather(location, temp)
+                    self._weather_ok = True
+                    return temp
+                logger.warning("Weather API returned HTTP %s, using simulation",
+                               response.status_code)
             except Exception as e:
                 logger.warning(
-                    f"Failed to get weather data: {e}, using simulation")
-
-        # Fallback to simulation
-        now = datetime.now()
-        hour = now.hour
-        # Simulate daily temperature variation
-        base_temp = 20.0 + 10.0 * math.sin((hour - 6) * math.pi / 12)
-        noise = random.uniform(-2.0, 2.0)
-        return base_temp + noise
+                    "Failed to get weather data: %s, using simulation", e)
+            self._weather_ok = False
+
+        # Fallback to simulation: daily temperature variation plus noise
+        if hour is None:
+            hour = time.localtime().tm_hour
+        return DIURNAL_TEMPS[hour] + random.uniform(-2.0, 2.0)
+
+    def _read_shared_weather(self, location) -> Optional[float]:
+        """Return the shared weather file's reading if fresh, else None
+
+        A hit also refreshes the in-process cache, aged to expire together
+        with the file.
+        """
+        if self._weather_file is None:
+            return None
+        try:
+            age = time.time() - self._weather_file.stat().st_mtime
+            if age >= self._weather_ttl:
+                return None
+            data = _json_loads(self._weather_file.read_bytes())
+            if tuple(data['location']) != location:
+                return None
+            temp = data['temp']
+        except (OSError, ValueError, KeyError, TypeError):
+            return None
+        self._weather_cache = {'ts': time.monotonic() - age, 'temp': temp}
+        return temp
+
+    def _write_shared_weather(self, location, temp: float) -> None:
+        """Publish a fresh reading to the shared weather file"""
+        if self._weather_file is None:
+            return
+        # Write then rename, so readers never see a partial file
+        tmp = self._weather_file.with_name(
+            f"{self._weather_file.name}.{os.getpid()}.tmp")
+        try:
+            self._weather_file.parent.mkdir(parents=True, exist_ok=True)
+            tmp.write_bytes(_json_dumps({'location': location, 'temp': temp}))
+            os.replace(tmp, self._weather_file)
+        except OSError as e:
+            logger.warning("Failed to write shared weather cache: %s", e)
+
+    def _weather_loop(self) -> None:
+        """Refresh the live outside temperature off the control loop"""
+        while True:
+            # After a failed fetch the simulated fallback is in use: retry soon
+            interval = self._weather_ttl if self._weather_ok else WEATHER_RETRY_S
+            if self._stop_event.wait(interval):
+                return
+            # A single float attribute store; the control loop only reads it
+            self.state.outside_temp = self.get_outside_temp('live')
+
+    def _refill_draws(self) -> None:
+        """Pre-draw a block of per-tick control noise"""
+        self._noise = self._rng.uniform(-0.05, 0.05, RNG_BUFFER_SIZE).tolist()
+        self._draw_index = 0
 
     def update_control_logic(self, dt: float) -> None:
         """Update DDC control logic"""
-        # Temperature control with PID (error = actual - setpoint for cooling control)
-        temp_error = self.state.supply_temp - self.state.setpoint
-        pid_output = self.pid.update(temp_error, dt)
-
-        # Update VFD speed based on PID output (0-100% range)
-        # When supply temp is below setpoint (cooling not needed), reduce speed
-        if temp_error < -2.0:  # Much colder than needed
-            self.state.vfd_speed = max(
-                0.0, min(100.0, 20.0 + pid_output * 5.0))
-        else:  # Normal or warm
-            self.state.vfd_speed = max(
-                0.0, min(100.0, 50.0 + pid_output * 10.0))
-
-        # Economizer logic based on outside temperature
-        if self.state.outside_temp < self.state.setpoint + 2.0:
-            # Use free cooling when outside temp is favorable
-            self.state.economizer_position = min(100.0,
-                                                 (self.state.setpoint + 2.0 - self.state.outside_temp) * 25.0)
-        else:
-            self.state.economizer_position = 0.0
-
-        # Simulate supply air temperature response with more effective cooling
-        cooling_effect = (self.state.vfd_speed - 50.0) / \
-            50.0 * 1.5  # More cooling effect
-        economizer_effect = self.state.economizer_position / 100.0 * \
-            (self.state.outside_temp - self.state.supply_temp) * 0.1
-
-        temp_change = -cooling_effect + \
-            economizer_effect + random.uniform(-0.05, 0.05)
-        self.state.supply_temp += temp_change * dt
+        i = self._draw_index
+        if i == RNG_BUFFER_SIZE:
+            self._refill_draws()
+            i = 0
+        self._draw_index = i + 1
+
+        self._control_step(dt, self._noise[i])
+
+        # Alarm raise and clear are independent per-tick Bernoulli events, so
+        # the ticks until each next fires are geometric: count them down
+        # rather than drawing every tick (same process as update_alarm())
+        self._alarm_in -= 1
+        self._clear_in -= 1
+        if self._alarm_in == 0 or self._clear_in == 0:
+            self._update_alarm_countdown()
+
+    def update_control_logic_batch(self, dts: np.ndarray) -> np.ndarray:
+        """Run update_control_logic for each dt and return supply temperatures
+
+        The plant is a closed-loop recurrence (each error depends on the
+        previous supply temperature), so ticks are still stepped in order,
+        inside one ddc_run() call; the random noise and alarm draws are
+        generated as NumPy arrays in one call instead of per tick. Alarms do
+        not feed back into the plant, so they are applied afterwards.
+        """
+        dts = np.ascontiguousarray(dts, dtype=np.float64)
+        noise = self._rng.uniform(-0.05, 0.05, size=dts.shape)
+        alarm_draws = self._rng.random(size=(dts.size, 2))
+
+        state, pid = self.state, self.pid
+        (history, state.supply_temp, state.vfd_speed,
+         state.economizer_position, pid.integral, pid.prev_error) = ddc_run(
+            state.supply_temp, state.outside_temp, state.setpoint,
+            state.vfd_speed, state.economizer_position,
+            pid.kp, pid.ki, pid.kd, pid.integral_limit,
+            pid.integral, pid.prev_error, dts, noise)
+        if dts.size:
+            state.fan_status = "ON" if state.vfd_speed > 10.0 else "OFF"
+
+        for fault_draw, clear_draw in alarm_draws.tolist():
+            self.update_alarm(fault_draw, clear_draw)
+        return history
+
+    def _control_step(self, dt: float, noise: float) -> None:
+        """Advance PID, VFD, economizer and plant model by one tick"""
+        state, pid = self.state, self.pid
+        # Temperature control with PID (error = actual - setpoint for cooling
+        # control); PIDController.update() inlined to save a call per tick
+        temp_error = state.supply_temp - state.setpoint
+        pid_output, pid.integral = pid_step(
+            pid.kp, pid.ki, pid.kd, pid.integral_limit,
+            pid.integral, pid.prev_error, temp_error, dt)
+        pid.prev_error = temp_error
+
+        (state.supply_temp, state.vfd_speed,
+         state.economizer_position) = ddc_step(
+            state.supply_temp, state.outside_temp,
+            state.setpoint, pid_output, dt, noise)
 
         # Fan status logic
-        if self.state.vfd_speed > 10.0:
-            self.state.fan_status = "ON"
-        else:
-            self.state.fan_status = "OFF"
-
-        # Alarm generation on sensor faults (simulate randomly)
-        if random.random() < 0.001:  # 0.1% chance per update
-            alarms = ["High Supply Temp", "Low Airflow",
-                      "Filter Alarm", "Sensor Fault"]
-            self.state.alarm = random.choice(alarms)
-        elif random.random() < 0.01:  # 1% chance to clear alarm
+        state.fan_status = "ON" if state.vfd_speed > 10.0 else "OFF"
+
+    def _update_alarm_countdown(self) -> None:
+        """Fire whichever alarm countdown reached zero and restart it"""
+        raised = self._alarm_in == 0
+        if raised:
+            self.state.alarm = random.choice(ALARM_NAMES)
+            self._alarm_in = int(self._rng.geometric(ALARM_PROBABILITY))
+        if self._clear_in == 0:
+            if not raised:
+                self.state.alarm = None
+            self._clear_in = int(self._rng.geometric(ALARM_CLEAR_PROBABILITY))
+
+    def update_alarm(self, fault_draw: float, clear_draw: float) -> None:
+        """Alarm generation on sensor faults from uniform [0, 1) draws"""
+        if fault_draw < ALARM_PROBABILITY:
+            self.state.alarm = random.choice(ALARM_NAMES)
+        elif clear_draw < ALARM_CLEAR_PROBABILITY:
             self.state.alarm = None
 
-    def create_telemetry_payload(self) -> Dict[str, Any]:
-        """Create telemetry JSON payload"""
+    def create_telemetry_payload(self, ts: Optional[int] = None) -> Dict[str, Any]:
+        """Create telemetry JSON payload (ts in epoch ms, default now)"""
+        if ts is None:
+            ts = time.time_ns() // 1_000_000
         return {
-            "ts": int(time.time() * 1000),
+            "ts": ts,
             "device": self.config.get('device_id', 'ahu1'),
             "building": self.config.get('building_id', 'demo_building'),
             "points": {
@@ -196,49 +496,123 @@ class AHUSimulator:
             }
         }
 
-    def publish_telemetry(self) -> None:
-        """Publish telemetry data to MQTT"""
+    def encode_telemetry_json(self, ts: Optional[int] = None) -> bytes:
+        """Encode the current state as JSON without building the payload dict
+
+        Produces the same document as JSON-encoding create_telemetry_payload():
+        the device/building part is encoded once in __init__ and the floats
+        are formatted to one decimal in place of round().
+        """
+        if ts is None:
+            ts = time.time_ns() // 1_000_000
+        state = self.state
+        return (
+            f'{{"ts":{ts},{self._json_ids},"points":{{'
+            f'"outside_temp":{state.outside_temp:.1f},'
+            f'"supply_temp":{state.supply_temp:.1f},'
+            f'"setpoint":{state.setpoint:.1f},'
+            f'"vfd_speed":{state.vfd_speed:.1f},'
+            f'"fan_status":{_json_string(state.fan_status)},'
+            f'"alarm":{_json_string(state.alarm)},'
+            f'"economizer_position":{state.economizer_position:.1f}}}}}'
+        ).encode()
+
+    def encode_telemetry_payload(self, payload: Dict[str, Any]) -> Any:
+        """Serialize a telemetry payload using the configured payload_format"""
+        if self.config.get('payload_format', 'json') == 'msgpack':
+            return msgpack.packb(payload)
+        return _json_dumps(payload)
+
+    def publish_telemetry(self, ts: Optional[int] = None) -> None:
+        """Publish telemetry data to MQTT (ts in epoch ms, default now)"""
         if self.mqtt_client and self.mqtt_client.is_connected():
-            topic = self.config.get('mqtt_topic', 'building/ahu1/telemetry')
-            payload = self.create_telemetry_payload()
-
-            try:
-                self.mqtt_client.publish(topic, json.dumps(payload))
-                logger.debug(f"Published telemetry: {payload}")
-            except Exception as e:
-                logger.error(f"Failed to publish telemetry: {e}")
+            if self._batch_size <= 1:
+                if self._json_ids is not None:
+                    self._publish(self.encode_telemetry_json(ts))
+                else:
+                    self._publish(self.encode_telemetry_payload(
+                        self.create_telemetry_payload(ts)))
+                return
+
+            payload = self.create_telemetry_payload(ts)
+            if not self._pending:
+                self._pending_since = time.monotonic()
+            self._pending.append(payload)
+            if (len(self._pending) >= self._batch_size
+                    or time.monotonic() - self._pending_since >= self._batch_max_age):
+                self.flush_telemetry()
         else:
             logger.warning("MQTT client not connected")
 
+    def flush_telemetry(self) -> None:
+        """Publish any batched payloads as a single message"""
+        if self._pending:
+            pending, self._pending = self._pending, []
+            self._publish(self.encode_telemetry_payload(pending))
+
+    def _publish(self, data: bytes, topic: Optional[str] = None) -> None:
+        """Publish an encoded payload (or list of payloads) to the topic"""
+        if topic is None:
+            topic = self.config.get('mqtt_topic', 'building/ahu1/telemetry')
+        try:
+            # Telemetry is fire-and-forget: QoS 0, never retained
+            self.mqtt_client.publish(topic, data, qos=0, retain=False)
+            if logger.isEnabledFor(logging.DEBUG):
+                logger.debug("Published telemetry: %s", data)
+        except Exception as e:
+            logger.error("Failed to publish telemetry: %s", e)
+
     def run(self, mode: str, cadence: float) -> None:
         """Main simulation loop"""
         logger.info(
             f"Starting AHU simulator in {mode} mode with {cadence}s cadence")
         self.running = True
 
-        while self.running:
+        # Ticks are scheduled against absolute deadlines, so the time spent
+        # doing the work does not add to the period and drift does not build up
+        # Live weather is fetched once up front, then refreshed by a daemon
+        # thread so a slow API call never stalls a tick
+        if mode == 'live':
+            self.state.outside_temp = self.get_outside_temp(mode)
+            self._stop_event.clear()
+            self._weather_thread = threading.Thread(
+                target=self._weather_loop, name='weather', daemon=True)
+            self._weather_thread.start()
+
+        next_tick = time.monotonic()
+        self.last_update = next_tick
+
+        while self.running and not _STOP.is_set():
             try:
-                current_time = time.time()
+                current_time = time.monotonic()
                 dt = current_time - self.last_update
                 self.last_update = current_time
+                # One wall-clock read per tick, for the timestamp and the hour
+                now_ns = time.time_ns()
 
-                # Update outside temperature
-                self.state.outside_temp = self.get_outside_temp(mode)
+                # Update outside temperature (live mode: weather thread)
+                if mode != 'live':
+                    self.state.outside_temp = self.get_outside_temp(
+                        mode, time.localtime(now_ns // 1_000_000_000).tm_hour)
 
                 # Update control logic
                 self.update_control_logic(dt)
 
                 # Publish telemetry
-                self.publish_telemetry()
+                self.publish_telemetry(now_ns // 1_000_000)
 
-                # Wait for next cycle
-                time.sleep(cadence)
+                # Wait for next cycle, servicing MQTT meanwhile; after an
+                # overrun, resync rather than firing a burst of catch-up ticks
+                next_tick += cadence
+                if next_tick <= time.monotonic():
+                    next_tick = time.monotonic()
+                self._service_mqtt(next_tick)
 
             except KeyboardInterrupt:
                 logger.info("Received interrupt signal")
                 break
             except Exception as e:
-                logger.error(f"Error in simulation loop: {e}")
+                logger.error("Error in simulation loop: %s", e)
                 time.sleep(1)
 
         self.stop()
@@ -247,11 +621,107 @@ class AHUSimulator:
         """Stop the simulator"""
         logger.info("Stopping AHU simulator")
         self.running = False
+        self._stop_event.set()
+        self._weather_session.close()
         if self.mqtt_client:
-            self.mqtt_client.loop_stop()
+            if self.mqtt_client.is_connected():
+                self.flush_telemetry()
             self.mqtt_client.disconnect()
 
 
+class AHUFleetSimulator(AHUSimulator):
+    """Several AHUs in one process, stepped together as NumPy arrays
+
+    Each unit's state lives in one array per variable (structure of arrays),
+    so a tick is a handful of vectorized operations regardless of n_ahus.
+    The units share the building's outside temperature, the PID gains and
+    one MQTT client; each publishes to its own topic.
+    """
+
+    def __init__(self, config: Dict[str, Any]):
+        super().__init__(config)
+        n = config.get('n_ahus', 1)
+        self.device_ids = config.get('device_ids') or [
+            f"ahu{i + 1}" for i in range(n)]
+        building = config.get('building_id', 'demo_building')
+        template = config.get('mqtt_topic_template',
+                              'building/{building}/{device}/telemetry')
+        self.topics = [template.format(building=building, device=device)
+                       for device in self.device_ids]
+        if self._batch_size > 1:
+            logger.warning("publish_batch_size is ignored with n_ahus > 1")
+
+        n = len(self.device_ids)
+        self.supply = np.full(n, self.state.supply_temp)
+        self.setpoint = np.full(n, self.state.setpoint)
+        self.vfd = np.full(n, self.state.vfd_speed)
+        self.econ = np.full(n, self.state.economizer_position)
+        self.integral = np.zeros(n)
+        self.prev_error = np.zeros(n)
+        self.alarms: list = [None] * n
+
+    def update_control_logic(self, dt: float) -> None:
+        """Advance every AHU by one tick"""
+        pid = self.pid
+        n = self.supply.size
+        error = self.supply - self.setpoint
+        self.integral += error * dt
+        np.clip(self.integral, -pid.integral_limit, pid.integral_limit,
+                out=self.integral)
+        derivative = (error - self.prev_error) / dt if dt > 0 else 0.0
+        self.prev_error = error
+        pid_output = pid.kp * error + pid.ki * self.integral + pid.kd * derivative
+
+        self.supply, self.vfd, self.econ = ddc_step_array(
+            self.supply, self.state.outside_temp, self.setpoint, pid_output,
+            dt, self._rng.uniform(-0.05, 0.05, n))
+
+        # Same per-unit alarm process as update_alarm(); only the (rare)
+        # units whose alarm changes are visited
+        draws = self._rng.random((n, 2))
+        raised = draws[:, 0] < ALARM_PROBABILITY
+        cleared = ~raised & (draws[:, 1] < ALARM_CLEAR_PROBABILITY)
+        for i in np.flatnonzero(raised).tolist():
+            self.alarms[i] = random.choice(ALARM_NAMES)
+        for i in np.flatnonzero(cleared).tolist():
+            self.alarms[i] = None
+
+    def create_telemetry_payloads(self, ts: Optional[int] = None) -> list:
+        """Create one telemetry payload per AHU (ts in epoch ms, default now)"""
+        if ts is None:
+            ts = time.time_ns() // 1_000_000
+        building = self.config.get('building_id', 'demo_building')
+        outside_temp = round(self.state.outside_temp, 1)
+        return [
+            {
+                "ts": ts,
+                "device": device,
+                "building": building,
+                "points": {
+                    "outside_temp": outside_temp,
+                    "supply_temp": round(supply_temp, 1),
+                    "setpoint": round(setpoint, 1),
+                    "vfd_speed": round(vfd_speed, 1),
+                    "fan_status": "ON" if vfd_speed > 10.0 else "OFF",
+                    "alarm": alarm,
+                    "economizer_position": round(econ, 1)
+                }
+            }
+            for device, supply_temp, setpoint, vfd_speed, econ, alarm in zip(
+                self.device_ids, self.supply.tolist(), self.setpoint.tolist(),
+                self.vfd.tolist(), self.econ.tolist(), self.alarms)
+        ]
+
+    def publish_telemetry(self, ts: Optional[int] = None) -> None:
+        """Publish each AHU's telemetry to its own topic"""
+        if self.mqtt_client and self.mqtt_client.is_connected():
+            for topic, payload in zip(self.topics,
+                                      self.create_telemetry_payloads(ts)):
+                self._publish(self.encode_telemetry_payload(payload), topic)
+        else:
+            logger.warning("MQTT client not connected")
+
+
 def load_config(config_path: str) -> Dict[str, Any]:
     """Load configuration from YAML file"""
     try:
@@ -266,9 +736,9 @@ def load_config(config_path: str) -> Dict[str, Any]:
 
 
 def signal_handler(signum, frame):
-    """Handle shutdown signals"""
+    """Handle shutdown signals by asking the simulation loop to stop"""
     logger.info("Received shutdown signal")
-    sys.exit(0)
+    _STOP.set()
 
 
 def main():
@@ -283,6 +753,9 @@ def main():
 
     args = parser.parse_args()
 
+    # A broken log handler must not take down the simulation loop
+    logging.raiseExceptions = False
+
     # Setup signal handlers
     signal.signal(signal.SIGINT, signal_handler)
     signal.signal(signal.SIGTERM, signal_handler)
@@ -291,7 +764,10 @@ def main():
     config = load_config(args.config)
 
     # Create and run simulator
-    simulator = AHUSimulator(config)
+    if config.get('n_ahus', 1) > 1:
+        simulator = AHUFleetSimulator(config)
+    else:
+        simulator = AHUSimulator(config)
 
     try:
         simulator.run(args.mode, args.cadence)
@@ -4,21 +4,33 @@ Quick start script for the Telemetry Pipeline and Dashboard project.
 This script starts all the essential services for local development.
 """
 
+import multiprocessing as mp
+import socket
 import subprocess
 import sys
 import time
 import os
+import urllib.request
 from pathlib import Path
 
+import uvicorn
+
+from collector.ingest import main as collector_main
+from simulator.ahu_simulator import main as simulator_main
+
+# Interpreter for the AHU simulator. By default it runs in a child of this
+# process; set this to run it under another interpreter instead, e.g. PyPy:
+#   SIMULATOR_PYTHON=pypy3 python start_services.py
+SIMULATOR_PYTHON = os.environ.get("SIMULATOR_PYTHON")
+
 
 def run_command(command, description, background=False):
-    """Run a command with description"""
+    """Run a command (an argument list, no shell) with description"""
     print(f"🔄 {description}...")
     if background:
-        return subprocess.Popen(command, shell=True)
+        return subprocess.Popen(command)
     else:
-        result = subprocess.run(command, shell=True,
-                                capture_output=True, text=True)
+        result = subprocess.run(command, capture_output=True, text=True)
         if result.returncode == 0:
             print(f"✅ {description} completed successfully")
             return result
@@ -27,6 +39,46 @@ def run_command(command, description, background=False):
             return None
 
 
+def wait_ready(probe, timeout=60.0, interval=0.2):
+    """Poll probe() until it succeeds or timeout seconds pass"""
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            probe()
+            return True
+        except OSError:
+            time.sleep(interval)
+    return False
+
+
+def probe_port(host, port):
+    """Open and close a TCP connection; raises OSError if refused"""
+    socket.create_connection((host, port), timeout=1).close()
+
+
+def probe_http(url):
+    """GET a health endpoint; raises OSError unless it answers 2xx"""
+    urllib.request.urlopen(url, timeout=1).close()
+
+
+def run_backend():
+    """Serve the FastAPI backend (process target)"""
+    uvicorn.Server(uvicorn.Config(
+        "backend.status:app", host="0.0.0.0", port=8000)).run()
+
+
+def start_process(target, description):
+    """Run a service entry point in a child process of this interpreter
+
+    The child reuses the modules this script already imported instead of
+    starting a fresh interpreter per service.
+    """
+    print(f"🔄 {description}...")
+    process = mp.Process(target=target, name=description)
+    process.start()
+    return process
+
+
 def main():
     """Main startup sequence"""
     print("🚀 Starting Telemetry Pipeline and Dashboard Services")
@@ -40,38 +92,37 @@ def main():
     # Start Docker services
     print("\n📦 Starting Docker Infrastructure...")
     docker_result = run_command(
-        "docker-compose up -d", "Docker services startup")
+        ["docker-compose", "up", "-d"], "Docker services startup")
     if not docker_result:
         print("❌ Failed to start Docker services. Make sure Docker is running.")
         return 1
 
-    # Wait for services to start
+    # Wait for the broker and database to accept connections. Docker's port
+    # proxy accepts TCP before InfluxDB is up, so ask its health endpoint
     print("⏳ Waiting for services to initialize...")
-    time.sleep(10)
+    if not wait_ready(lambda: probe_port("localhost", 1883)):
+        print("⚠️  MQTT broker not reachable on port 1883 yet")
+    if not wait_ready(lambda: probe_http("http://localhost:8086/health")):
+        print("⚠️  InfluxDB not healthy on port 8086 yet")
 
     # Start Python services in background
     print("\n🐍 Starting Python Services...")
 
     # Start AHU Simulator
-    ahu_process = run_command(
-        "python simulator/ahu_simulator.py",
-        "AHU Simulator",
-        background=True
-    )
+    if SIMULATOR_PYTHON:
+        ahu_process = run_command(
+            [SIMULATOR_PYTHON, "simulator/ahu_simulator.py"],
+            "AHU Simulator",
+            background=True
+        )
+    else:
+        ahu_process = start_process(simulator_main, "AHU Simulator")
 
     # Start Telemetry Collector
-    collector_process = run_command(
-        "python collector/ingest.py",
-        "Telemetry Collector",
-        background=True
-    )
+    collector_process = start_process(collector_main, "Telemetry Collector")
 
     # Start FastAPI Backend
-    backend_process = run_command(
-        "python -m uvicorn backend.status:app --host 0.0.0.0 --port 8000",
-        "FastAPI Backend",
-        background=True
-    )
+    backend_process = start_process(run_backend, "FastAPI Backend")
 
     print("\n🌐 Services Started!")
     print("=" * 60)
@@ -95,15 +146,16 @@ def main():
         print("\n🛑 Stopping services...")
 
         # Stop Python processes
-        if 'ahu_process' in locals():
-            ahu_process.terminate()
-        if 'collector_process' in locals():
-            collector_process.terminate()
-        if 'backend_process' in locals():
-            backend_process.terminate()
+        for process in (ahu_process, collector_process, backend_process):
+            process.terminate()
+        for process in (ahu_process, collector_process, backend_process):
+            if isinstance(process, mp.Process):
+                process.join()
+            else:
+                process.wait()
 
         # Stop Docker services
-        run_command("docker-compose down", "Docker services shutdown")
+        run_command(["docker-compose", "down"], "Docker services shutdown")
         print("✅ All services stopped.")
         return 0
 